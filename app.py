@@ -1,8 +1,58 @@
+import json
+import os
 import streamlit as st
 import pickle
-import pandas as pd
 import numpy as np
 
+from compiled_model import compile_model, load_compiled
+from inference import (FEATURE_COLUMNS, INPUT_FIELDS, FeatureEncoder, predict_with_contributions,
+                       predict_with_proba, sweep_inputs)
+from lookup_table import load_table
+from metrics import MetricsRegistry, PhaseTimer
+from model_registry import REGISTRY_DIR, ModelWatcher
+from prediction_cache import PredictionCache, file_signature, make_key
+from recommendations import messages, recommend
+from validation import RANGES, describe_rule, failed_rules, validate_frame
+from worker_pool import PoolBusy, PredictionPool
+
+COMPILED_MODEL_DIR = 'model_compiled'
+RISK_TABLE_DIR = 'risk_table'
+MODEL_FILES = (
+    'model.pkl',
+    os.path.join(COMPILED_MODEL_DIR, 'metadata.json'),
+    os.path.join(RISK_TABLE_DIR, 'metadata.json'),
+)
+# Admin panel with timing metrics: open the app with ?admin=1 or set CARDIO_ADMIN=1
+ADMIN_ENABLED = os.environ.get('CARDIO_ADMIN') == '1'
+# Optional JSON metrics export, rewritten at most every CARDIO_METRICS_INTERVAL seconds
+METRICS_FILE = os.environ.get('CARDIO_METRICS_FILE')
+METRICS_INTERVAL = float(os.environ.get('CARDIO_METRICS_INTERVAL', '10'))
+# Score in CARDIO_WORKERS worker processes (see worker_pool.py) instead of the
+# script thread; at most CARDIO_QUEUE_DEPTH predictions wait or run at once
+PREDICT_WORKERS = int(os.environ.get('CARDIO_WORKERS', '0'))
+PREDICT_QUEUE_DEPTH = int(os.environ.get('CARDIO_QUEUE_DEPTH', '64'))
+PREDICT_TIMEOUT = float(os.environ.get('CARDIO_PREDICT_TIMEOUT', '10'))
+# Publish the model once into this shared-memory directory (e.g. /dev/shm/cardio-model)
+# and map it from there, so every app process and worker shares one copy
+SHARED_MODEL_DIR = os.environ.get('CARDIO_SHARED_MODEL_DIR')
+# Inputs the what-if sweep can vary, with their axis labels
+SWEEP_FIELDS = {
+    'weight': "Weight (kg)",
+    'ap_hi': "Systolic Blood Pressure (mmHg)",
+    'ap_lo': "Diastolic Blood Pressure (mmHg)",
+    'age': "Age (years)",
+    'height': "Height (cm)",
+    'cholesterol': "Cholesterol Level",
+    'gluc': "Glucose Level",
+}
+# Names of the model's features in the attribution chart
+FEATURE_LABELS = dict(SWEEP_FIELDS, **{
+    'smoke': "Smoking Status",
+    'alco': "Alcohol Consumption",
+    'active': "Physical Activity",
+    'bmi': "BMI",
+})
+
 # Set page configuration
 st.set_page_config(
     page_title="Cardiovascular Disease Predictor",
@@ -11,6 +61,14 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Timing metrics shared by all sessions
+@st.cache_resource
+def get_metrics():
+    return MetricsRegistry()
+
+metrics = get_metrics()
+rerun_timer = PhaseTimer(metrics, 'rerun')
+
 # Custom CSS for animations and better UI
 st.markdown("""
     <style>
@@ -345,19 +403,101 @@ st.markdown("""
     }
     </style>
 """, unsafe_allow_html=True)
+rerun_timer.lap('css')
 
-# Load the trained model
-@st.cache_resource
-def load_model():
-    with open('model.pkl', 'rb') as file:
-        model = pickle.load(file)
+# Load the trained model (reloaded whenever the model files change)
+@st.cache_resource(max_entries=1)
+def load_model(signature, path):
+    # Prefer the pickle-free export (see compiled_model.py): it starts much
+    # faster, does not need scikit-learn at runtime and is mapped read-only,
+    # so processes loading the same export share its memory
+    with metrics.time('model.load'):
+        if os.path.isdir(path):
+            model = load_compiled(path)
+        else:
+            with open(path, 'rb') as file:
+                # Evaluate all trees at once instead of sklearn's per-estimator loop
+                model = compile_model(pickle.load(file))
+        # Precompute the path totals behind the feature attributions
+        model.node_contributions()
     return model
 
-try:
-    model = load_model()
-except FileNotFoundError:
-    st.error("❌ Error: model.pkl file not found. Please ensure model.pkl is in the same directory as app.py")
-    st.stop()
+# Converts the model into shared memory once per host (see model_host.py);
+# later processes find it published and only map it
+@st.cache_resource(max_entries=1)
+def publish_shared_model(signature, source):
+    # Imported only when shared hosting is configured
+    from model_host import publish
+    with metrics.time('model.publish'):
+        return publish(source, SHARED_MODEL_DIR)
+
+# Precomputed risk table (see lookup_table.py), used only if it was built
+# from the loaded model
+@st.cache_resource(max_entries=1)
+def load_risk_table(signature, _model):
+    return load_table(RISK_TABLE_DIR, _model)
+
+# Encodes form inputs straight into the model's feature array; the column
+# schema is validated once here rather than on every prediction
+@st.cache_resource(max_entries=1)
+def load_encoder(signature, _model):
+    return FeatureEncoder(_model)
+
+def explain_one(model, features):
+    labels, probas, bias, contributions = predict_with_contributions(model, features)
+    return labels[0], probas[0], bias, contributions[0]
+
+# pandas is imported on first use: rendering the form doesn't need it, only
+# the charts and tables drawn after a prediction or in the admin panel
+def get_pandas():
+    import pandas
+    return pandas
+
+# Prediction cache shared by all sessions
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache(maxsize=10_000, ttl=3600)
+
+# Versioned models published to the registry (see model_registry.py) are
+# loaded in the background and swapped in without a restart
+@st.cache_resource
+def get_model_watcher():
+    return ModelWatcher(REGISTRY_DIR)
+
+active_model = get_model_watcher().current()
+if active_model is not None:
+    # Drop any model loaded from model.pkl before the registry had a version
+    load_model.clear()
+    load_encoder.clear()
+    model, encoder = active_model.model, active_model.encoder
+    model_signature = active_model.version
+    model_path = active_model.path
+else:
+    model_signature = file_signature(*MODEL_FILES)
+    model_path = COMPILED_MODEL_DIR if os.path.isdir(COMPILED_MODEL_DIR) else 'model.pkl'
+    try:
+        if SHARED_MODEL_DIR:
+            model_path = publish_shared_model(model_signature, model_path)
+        model = load_model(model_signature, model_path)
+    except FileNotFoundError:
+        st.error("❌ Error: model.pkl file not found. Please ensure model.pkl is in the same directory as app.py")
+        st.stop()
+    encoder = load_encoder(model_signature, model)
+
+prediction_cache = get_prediction_cache()
+prediction_cache.validate(model_signature)
+
+# Worker processes shared by all sessions, each loading the model from
+# model_path (an export is mapped, so they share its memory)
+@st.cache_resource
+def get_prediction_pool(_model_path):
+    if PREDICT_WORKERS <= 0:
+        return None
+    return PredictionPool(PREDICT_WORKERS, PREDICT_QUEUE_DEPTH, _model_path)
+
+prediction_pool = get_prediction_pool(model_path)
+risk_table = load_risk_table(model_signature, model)
+rerun_timer.lap('model_load')
 
 # Page title and description
 st.title("❤️ Cardiovascular Disease Risk Predictor")
@@ -378,24 +518,24 @@ with col1:
     
     age = st.number_input(
         "Age (years)",
-        min_value=18,
-        max_value=100,
+        min_value=RANGES['age'][0],
+        max_value=RANGES['age'][1],
         value=30,
-        help="Age should be between 18 and 100"
+        help=f"Age should be between {RANGES['age'][0]} and {RANGES['age'][1]}"
     )
     
     height = st.number_input(
         "Height (cm)",
-        min_value=100,
-        max_value=250,
+        min_value=RANGES['height'][0],
+        max_value=RANGES['height'][1],
         value=170,
         help="Height in centimeters"
     )
     
     weight = st.number_input(
         "Weight (kg)",
-        min_value=30,
-        max_value=200,
+        min_value=RANGES['weight'][0],
+        max_value=RANGES['weight'][1],
         value=70,
         help="Weight in kilograms"
     )
@@ -412,16 +552,16 @@ with col2:
     
     systolic_bp = st.number_input(
         "Systolic Blood Pressure (mmHg)",
-        min_value=60,
-        max_value=250,
+        min_value=RANGES['ap_hi'][0],
+        max_value=RANGES['ap_hi'][1],
         value=120,
         help="Higher number in BP reading"
     )
     
     diastolic_bp = st.number_input(
         "Diastolic Blood Pressure (mmHg)",
-        min_value=40,
-        max_value=150,
+        min_value=RANGES['ap_lo'][0],
+        max_value=RANGES['ap_lo'][1],
         value=80,
         help="Lower number in BP reading"
     )
@@ -468,6 +608,8 @@ with col5:
         help="0=Inactive, 1=Active"
     )
 
+rerun_timer.lap('widgets')
+
 # Calculate BMI
 bmi = weight / ((height / 100) ** 2)
 
@@ -502,29 +644,53 @@ with col_bmi:
         </div>
     """, unsafe_allow_html=True)
 
+rerun_timer.lap('health_metrics')
+
+# Raw inputs in the order FeatureEncoder expects (BMI is derived there)
+inputs = (
+    age,
+    height,
+    weight,
+    systolic_bp,  # ap_hi
+    diastolic_bp,  # ap_lo
+    cholesterol,
+    glucose,  # gluc
+    smoking,  # smoke
+    alcohol,  # alco
+    physical_activity,  # active
+)
+
 # Prediction button
 st.divider()
 if st.button("🔮 Predict Risk", use_container_width=True, type="primary"):
-    # Prepare features in the exact order the model was trained on
-    features = pd.DataFrame([[
-        0,  # Unnamed: 0 (index column)
-        age, 
-        height, 
-        weight, 
-        systolic_bp,  # ap_hi
-        diastolic_bp,  # ap_lo
-        cholesterol, 
-        glucose,  # gluc
-        smoking,  # smoke
-        alcohol,  # alco
-        physical_activity,  # active
-        bmi
-    ]], columns=['Unnamed: 0', 'age', 'height', 'weight', 'ap_hi', 'ap_lo', 'cholesterol', 'gluc', 'smoke', 'alco', 'active', 'bmi'])
+    predict_timer = PhaseTimer(metrics, 'predict')
     
     try:
-        # Make prediction
-        prediction = model.predict(features)[0]
-        prediction_proba = model.predict_proba(features)[0]
+        # The form bounds cover the per-field rules; this catches the rest
+        # (e.g. diastolic above systolic)
+        failed = failed_rules(dict(zip(INPUT_FIELDS, inputs)))
+        if failed:
+            raise ValueError("; ".join(describe_rule(name) for name in failed))
+
+        # Make prediction and its feature attributions (single pass through
+        # the ensemble, skipped entirely for profiles that were already scored)
+        def compute():
+            with metrics.time('predict.model'):
+                if prediction_pool is not None:
+                    # Waiting on the worker releases the GIL for other sessions
+                    labels, probas, bias, contributions = prediction_pool.predict(
+                        model_path, [inputs], PREDICT_TIMEOUT, contributions=True)
+                    result = labels[0], probas[0], bias, contributions[0]
+                else:
+                    result = explain_one(model, encoder.encode_one(*inputs))
+                if risk_table is not None:
+                    # The attributions still need the trees; the table's
+                    # probability is the one the rest of the app shows
+                    result = (risk_table.predict(*inputs)[0], risk_table.predict_proba(*inputs)) + result[2:]
+                return result
+        prediction, prediction_proba, bias, contributions = prediction_cache.get_or_compute(
+            make_key(inputs), compute)
+        predict_timer.lap('lookup')
         
         # Display results
         st.success("✅ Prediction Complete!")
@@ -550,33 +716,37 @@ if st.button("🔮 Predict Risk", use_container_width=True, type="primary"):
                 """, unsafe_allow_html=True)
                 risk_level = "High"
                 confidence = prediction_proba[1]
+        predict_timer.lap('result')
+        
+        # How much each input moved the risk (see CompiledEnsemble.contributions)
+        st.divider()
+        st.subheader("🧭 What Drove This Prediction")
+        pd = get_pandas()
+        # The leaked row-index column is always 0 here and says nothing about
+        # the patient, so its share goes into the baseline instead of a bar
+        shares = dict(zip(FEATURE_COLUMNS, contributions.tolist()))
+        index_share = shares.pop('Unnamed: 0')
+        baseline = bias + index_share
+        drivers = pd.DataFrame({
+            "Input": [FEATURE_LABELS[column] for column in shares],
+            "Risk change (percentage points)": np.array(list(shares.values())) * 100,
+        })
+        drivers = drivers[drivers["Risk change (percentage points)"].abs() >= 0.05]
+        drivers = drivers.iloc[np.argsort(-drivers["Risk change (percentage points)"].abs().to_numpy())]
+        st.bar_chart(drivers, x="Input", y="Risk change (percentage points)", horizontal=True, sort=False)
+        st.caption(f"Starting from a baseline risk of {baseline:.1%}, each bar shows how far one input "
+                   f"moved this prediction; together they add up to {bias + contributions.sum():.1%}. "
+                   f"The baseline is the average risk ({bias:.1%}) plus {index_share * 100:+.1f} points "
+                   f"from the dataset's row-index column, which the model was trained with but "
+                   f"which is not a health input.")
+        predict_timer.lap('contributions')
         
         # Additional health advice
         st.divider()
         st.subheader("💡 Health Recommendations")
         
-        recommendations = []
-        
-        if age > 50:
-            recommendations.append("**Age Factor:** Regular check-ups are important at your age.")
-        
-        if bmi >= 25:
-            recommendations.append("**Weight:** Consider maintaining a healthy BMI through diet and exercise.")
-        
-        if systolic_bp > 140 or diastolic_bp > 90:
-            recommendations.append("**Blood Pressure:** Your BP is elevated. Consult a healthcare professional.")
-        
-        if cholesterol >= 2:
-            recommendations.append("**Cholesterol:** High cholesterol levels. Discuss with your doctor about diet and medication.")
-        
-        if glucose >= 2:
-            recommendations.append("**Glucose:** High glucose levels. Regular monitoring is recommended.")
-        
-        if smoking == 1:
-            recommendations.append("**Smoking:** Consider quitting smoking to reduce cardiovascular risk.")
-        
-        if physical_activity == 0:
-            recommendations.append("**Exercise:** Increase physical activity. Aim for 150 minutes of moderate activity per week.")
+        # Rule table shared with batch scoring and the API (see recommendations.py)
+        recommendations = messages(recommend(dict(zip(INPUT_FIELDS, inputs), bmi=bmi)))
         
         if recommendations:
             for i, rec in enumerate(recommendations):
@@ -592,11 +762,59 @@ if st.button("🔮 Predict Risk", use_container_width=True, type="primary"):
                     <p style='margin: 0.5rem 0 0 0;'>Your health parameters look good! Keep maintaining your healthy lifestyle.</p>
                 </div>
             """, unsafe_allow_html=True)
+        predict_timer.lap('recommendations')
+        predict_timer.finish()
     
+    except PoolBusy:
+        st.warning("⏳ The server is busy with other predictions. Please try again in a moment.")
     except Exception as e:
         st.error(f"❌ Error in prediction: {str(e)}")
         st.info("Please ensure all inputs are valid and try again.")
 
+rerun_timer.lap('prediction')
+
+# What-if sweep: one input varied across its whole form range, with every
+# alternative scored in a single batched call
+st.divider()
+st.subheader("🔍 What-If Analysis")
+col_field, col_toggle = st.columns([2, 1])
+with col_field:
+    sweep_field = st.selectbox("Input to vary", options=list(SWEEP_FIELDS), format_func=SWEEP_FIELDS.get)
+with col_toggle:
+    show_sweep = st.toggle("Show risk curve", help="Risk across the full range of the chosen input, "
+                                                   "all other inputs unchanged")
+
+if show_sweep:
+    try:
+        low, high = RANGES[sweep_field]
+        values = np.arange(low, high + 1)
+        rows = sweep_inputs(inputs, sweep_field, values)
+        with metrics.time('what_if.model'):
+            if risk_table is not None:
+                sweep_proba = risk_table.predict_proba(*rows.T)
+            elif prediction_pool is not None:
+                sweep_proba = prediction_pool.predict(model_path, rows, PREDICT_TIMEOUT)[1]
+            else:
+                sweep_proba = predict_with_proba(model, encoder.encode_rows(rows))[1]
+        risk = sweep_proba[:, 1] * 100
+        pd = get_pandas()
+        # Leave gaps where the swept value breaks a rule (e.g. diastolic above systolic)
+        risk[~validate_frame(pd.DataFrame(rows, columns=INPUT_FIELDS))] = np.nan
+
+        label = SWEEP_FIELDS[sweep_field]
+        curve = pd.DataFrame({label: values, "Risk (%)": risk})
+        st.line_chart(curve, x=label, y="Risk (%)")
+        current = inputs[INPUT_FIELDS.index(sweep_field)]
+        lowest = int(np.nanargmin(risk))
+        st.caption(f"Risk at the current value ({current}): {risk[values == current][0]:.1f}% · "
+                   f"lowest: {risk[lowest]:.1f}% at {values[lowest]}")
+    except PoolBusy:
+        st.warning("⏳ The server is busy with other predictions. Please try again in a moment.")
+    except Exception as e:
+        st.error(f"❌ Error in what-if analysis: {str(e)}")
+
+rerun_timer.lap('what_if')
+
 # Footer
 st.divider()
 st.markdown("""
@@ -607,4 +825,58 @@ st.markdown("""
         professional for accurate diagnosis and treatment recommendations.</p>
         <p style='margin: 0.5rem 0 0 0;'><strong>🔒 Data Privacy:</strong> Your health information is processed locally and not stored or transmitted.</p>
     </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+rerun_timer.lap('footer')
+rerun_timer.finish()
+
+if METRICS_FILE:
+    metrics.maybe_export(METRICS_FILE, METRICS_INTERVAL)
+
+# Admin panel: per-phase timings of reruns and predictions across all sessions
+if ADMIN_ENABLED or st.query_params.get('admin') == '1':
+    st.divider()
+    st.subheader("⚙️ Performance Metrics")
+    snapshot = metrics.snapshot()
+    pd = get_pandas()
+    timings = pd.DataFrame.from_dict(snapshot, orient='index')
+    ms_columns = [c for c in timings.columns if c not in ('count', 'sum')]
+    timings[ms_columns] = timings[ms_columns] * 1000
+    st.caption("Milliseconds over the most recent observations of each phase")
+    st.dataframe(timings.round(3), use_container_width=True)
+
+    cache_stats = prediction_cache.stats()
+    col_hits, col_rate, col_size = st.columns(3)
+    col_hits.metric("Cache Hits / Misses", f"{cache_stats['hits']} / {cache_stats['misses']}")
+    col_rate.metric("Cache Hit Rate", f"{cache_stats['hit_rate']:.1%}")
+    col_size.metric("Cached Profiles", f"{cache_stats['size']} / {cache_stats['maxsize']}")
+
+    if prediction_pool is not None:
+        pool_stats = prediction_pool.stats()
+        col_workers, col_queue, col_rejected = st.columns(3)
+        col_workers.metric("Prediction Workers", pool_stats['workers'])
+        col_queue.metric("In Flight / Queue Depth", f"{pool_stats['in_flight']} / {pool_stats['queue_depth']}")
+        col_rejected.metric("Rejected (Busy)", pool_stats['rejected'])
+
+    # PSS splits shared pages (e.g. a mapped model) among the processes using them
+    from model_host import memory_usage
+    memory = memory_usage()
+    rss_mb = memory['rss_mb'] if memory['rss_mb'] is not None else memory['peak_rss_mb']
+    col_rss, col_pss, col_private = st.columns(3)
+    col_rss.metric("Process RSS (MB)", rss_mb if rss_mb is not None else "n/a")
+    col_pss.metric("Process PSS (MB)", memory['pss_mb'] if memory['pss_mb'] is not None else "n/a")
+    col_private.metric("Private Memory (MB)", memory['private_mb'] if memory['private_mb'] is not None else "n/a")
+
+    if active_model is not None:
+        report = active_model.metadata['report']
+        st.caption(f"Model version {active_model.version} "
+                   f"({active_model.metadata['n_estimators']} trees, published {active_model.metadata['created_at']})"
+                   + (f", accuracy {report['test_accuracy']:.2%}" if 'test_accuracy' in report else ""))
+
+    st.download_button(
+        "Download metrics (JSON)",
+        data=json.dumps({'metrics': snapshot, 'cache': cache_stats, 'memory': memory,
+                         'pool': prediction_pool.stats() if prediction_pool is not None else None},
+                        indent=2),
+        file_name="cardio_metrics.json",
+        mime="application/json"
+    )
@@ -0,0 +1,160 @@
+"""Score a file of patient records with the trained model.
+
+Reads ``;``-separated CSV files in the same layout as ``cardio_train.csv`` and
+writes one output row per input row with the predicted label and the
+probability of cardiovascular disease, plus the health recommendations
+that apply (see recommendations.py) as a bitset and, with
+``--recommendation-names``, as rule names. ``--contributions`` adds how much
+each feature moved the probability (see ``CompiledEnsemble.contributions``).
+Rows that break a data-quality rule (see validation.py) are not scored
+unless ``--no-validate`` is given: they keep their place in the output with
+an empty prediction and probability, and a ``failed_rules`` column names
+the rules each row broke. The rejections per rule are reported on stderr.
+
+Usage:
+    python batch_score.py cardio_train.csv -o predictions.csv
+"""
+
+import argparse
+import pickle
+import sys
+import time
+
+import pandas as pd
+
+from compiled_model import compile_model
+from inference import (FEATURE_COLUMNS, FeatureEncoder, positive_class_index, predict_with_contributions,
+                       predict_with_proba)
+from recommendations import names_column, recommend_frame
+from validation import RULES, failed_rules_column, validate_frame
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def load_model(path):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def score_chunks(model, chunks, rule_counts=None, recommendation_names=False,
+                 contributions=False):
+    """Yield one result frame per input chunk, with one row per input row.
+
+    With ``rule_counts`` (a dict), rows failing validation are not scored
+    (empty prediction and probability), a ``failed_rules`` column names the
+    rules they broke, and the rejections are counted per rule in
+    ``rule_counts``. ``recommendation_names`` adds a column of
+    ``|``-joined recommendation names next to the bitset, and
+    ``contributions`` (which needs a ``CompiledEnsemble``) one
+    ``contribution_<feature>`` column per model feature.
+    """
+    positive = positive_class_index(model)
+    encoder = FeatureEncoder(model)
+    # Scores the encoded arrays without sklearn's per-call name check
+    model = encoder.model
+    for chunk in chunks:
+        valid = None
+        if rule_counts is not None:
+            valid = validate_frame(chunk, rule_counts)
+            if valid.all():
+                valid = None
+        scored = chunk if valid is None else chunk[valid]
+        result = pd.DataFrame(index=scored.index)
+        if len(scored):
+            features = encoder.encode_frame(scored)
+            if contributions:
+                labels, probas, _, values = predict_with_contributions(model, features)
+            else:
+                labels, probas = predict_with_proba(model, features)
+            result['prediction'] = labels
+            result['probability'] = probas[:, positive]
+            if contributions:
+                for column, value in zip(FEATURE_COLUMNS, values.T):
+                    result[f'contribution_{column}'] = value
+        else:
+            result['prediction'] = pd.Series(dtype='Int64')
+            result['probability'] = pd.Series(dtype=float)
+            if contributions:
+                for column in FEATURE_COLUMNS:
+                    result[f'contribution_{column}'] = pd.Series(dtype=float)
+        if valid is not None:
+            # Rejected rows keep their place, unscored
+            result = result.reindex(chunk.index)
+            result['prediction'] = result['prediction'].astype('Int64')
+        result.insert(2, 'recommendations', recommend_frame(chunk))
+        if recommendation_names:
+            result.insert(3, 'recommendation_names', names_column(result['recommendations'].to_numpy()))
+        if rule_counts is not None:
+            result['failed_rules'] = failed_rules_column(chunk) if valid is not None else ''
+        if 'id' in chunk.columns:
+            result.insert(0, 'id', chunk['id'].to_numpy())
+        yield result
+
+
+def score_file(model, input_path, output, chunk_size=DEFAULT_CHUNK_SIZE, sep=';',
+               header=True, rule_counts=None, recommendation_names=False, contributions=False):
+    """Score ``input_path`` chunk by chunk, writing results to ``output``.
+
+    Only one chunk is held in memory at a time. Returns the number of rows
+    written.
+    """
+    chunks = pd.read_csv(input_path, sep=sep, chunksize=chunk_size)
+    rows = 0
+    for result in score_chunks(model, chunks, rule_counts, recommendation_names, contributions):
+        result.to_csv(output, header=header, index=False)
+        header = False
+        rows += len(result)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch cardiovascular risk scoring")
+    parser.add_argument('inputs', nargs='+', help="CSV files in cardio_train.csv format")
+    parser.add_argument('-o', '--output', default='-', help="Output CSV path (default: stdout)")
+    parser.add_argument('--model', default='model.pkl', help="Pickled model path")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows scored per chunk (bounds memory use)")
+    parser.add_argument('--sep', default=';', help="Input field separator")
+    parser.add_argument('--no-validate', action='store_true',
+                        help="Score every row, including ones that break a data-quality rule")
+    parser.add_argument('--recommendation-names', action='store_true',
+                        help="Also write the recommendations as rule names, not just a bitset")
+    parser.add_argument('--contributions', action='store_true',
+                        help="Also write each feature's contribution to the probability")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model)
+    if args.contributions:
+        # Attributions come from the compiled evaluator; its predictions are identical
+        model = compile_model(model)
+    rule_counts = None if args.no_validate else dict.fromkeys(RULES, 0)
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        total_rows = 0
+        total_seconds = 0.0
+        for i, path in enumerate(args.inputs):
+            start = time.perf_counter()
+            # Keep a single header when several inputs share one output
+            rows = score_file(model, path, output, args.chunk_size, args.sep,
+                              header=i == 0, rule_counts=rule_counts,
+                              recommendation_names=args.recommendation_names,
+                              contributions=args.contributions)
+            seconds = time.perf_counter() - start
+            total_rows += rows
+            total_seconds += seconds
+            print(f"{path}: {rows} rows in {seconds:.2f}s "
+                  f"({rows / max(seconds, 1e-9):,.0f} rows/s)", file=sys.stderr)
+        if len(args.inputs) > 1:
+            print(f"Total: {total_rows} rows in {total_seconds:.2f}s "
+                  f"({total_rows / max(total_seconds, 1e-9):,.0f} rows/s)", file=sys.stderr)
+        if rule_counts is not None and any(rule_counts.values()):
+            rejected = ', '.join(f"{name} {count}" for name, count in rule_counts.items() if count)
+            print(f"Not scored (rows per failed rule): {rejected}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
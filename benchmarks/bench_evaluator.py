@@ -0,0 +1,69 @@
+"""Compare the compiled multi-tree evaluator against stock sklearn.
+
+Measures single-row latency (the app.py case) and batch throughput for
+``BaggingClassifier.predict_proba`` and ``CompiledEnsemble.predict_proba`` on
+rows sampled from ``cardio_train.csv``, and checks the outputs are identical.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_evaluator --model model.pkl
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from compiled_model import compile_model
+from inference import build_feature_frame
+
+
+def time_calls(fn, repeat):
+    """Return per-call wall times in seconds."""
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='model.pkl')
+    parser.add_argument('--data', default='cardio_train.csv')
+    parser.add_argument('--repeat', type=int, default=200, help="Single-row calls to time")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 256, 4096, 65536])
+    args = parser.parse_args(argv)
+
+    with open(args.model, 'rb') as file:
+        model = pickle.load(file)
+    compiled = compile_model(model)
+    features = build_feature_frame(pd.read_csv(args.data, sep=';'))
+
+    reference = model.predict_proba(features)
+    identical = np.array_equal(reference, compiled.predict_proba(features))
+    print(f"Outputs identical on {len(features)} rows: {identical}")
+
+    rng = np.random.default_rng(0)
+    rows = [features.iloc[[i]] for i in rng.integers(len(features), size=args.repeat)]
+    print("\nSingle-row latency (ms)      p50       p99")
+    for name, backend in (('sklearn', model), ('compiled', compiled)):
+        it = iter(rows)
+        times = time_calls(lambda: backend.predict_proba(next(it)), len(rows)) * 1000
+        print(f"  {name:<22} {np.percentile(times, 50):9.3f} {np.percentile(times, 99):9.3f}")
+
+    print("\nBatch throughput (rows/s)   sklearn    compiled")
+    for size in args.batch_sizes:
+        batch = features.sample(size, replace=size > len(features), random_state=0)
+        repeat = max(3, min(50, 20_000 // size))
+        results = []
+        for backend in (model, compiled):
+            times = time_calls(lambda: backend.predict_proba(batch), repeat)
+            results.append(size / np.median(times))
+        print(f"  {size:>8} rows        {results[0]:>11,.0f} {results[1]:>11,.0f}")
+
+
+if __name__ == '__main__':
+    main()
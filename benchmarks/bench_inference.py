@@ -0,0 +1,256 @@
+"""Inference benchmark suite for the app, batch and service paths.
+
+Each back end is measured in a fresh child process so that model load time
+(including the imports unpickling pulls in) and peak RSS are not skewed by
+the other back ends. Inputs are real patient rows sampled from
+``cardio_train.csv``. Results are written as JSON so runs can be compared
+across model versions and back ends.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_inference --output bench.json
+    python -m benchmarks.bench_inference --compare old.json bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+BACKENDS = ('sklearn', 'compiled', 'compiled-artifact')
+DEFAULT_BATCH_SIZES = (1, 16, 256, 4096, 65536)
+
+# Metrics compared by --compare, and whether larger is better
+COMPARED_METRICS = {
+    'load_seconds': False,
+    'app_path.legacy_ms.p50': False,
+    'app_path.single_pass_ms.p50': False,
+    'app_path.encoded_single_pass_ms.p50': False,
+    'service.throughput_rps': True,
+    'peak_rss_mb': False,
+}
+
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {'p50': round(float(np.percentile(ms, 50)), 4),
+            'p90': round(float(np.percentile(ms, 90)), 4),
+            'p99': round(float(np.percentile(ms, 99)), 4)}
+
+
+def load_backend(name, args):
+    """Load the model for back end ``name``; this is what the load time covers."""
+    if name == 'compiled-artifact':
+        from compiled_model import load_compiled
+        return load_compiled(args.compiled)
+    import pickle
+    with open(args.model, 'rb') as file:
+        model = pickle.load(file)
+    if name == 'compiled':
+        from compiled_model import compile_model
+        return compile_model(model)
+    return model
+
+
+def sample_inputs(path, n, seed=0):
+    """Raw patient rows from the dataset, as the app form would send them."""
+    import pandas as pd
+    df = pd.read_csv(path, sep=';')
+    return df.sample(n, replace=n > len(df), random_state=seed).reset_index(drop=True)
+
+
+def bench_app_path(model, rows):
+    """Single-row latency on the app.py code path, split into its phases.
+
+    Covers both the original DataFrame path and the FeatureEncoder path the
+    app uses now.
+    """
+    from inference import FeatureEncoder, build_features, predict_with_proba
+    build, legacy, single_pass = [], [], []
+    for row in rows.itertuples(index=False):
+        bmi = row.weight / ((row.height / 100) ** 2)
+        start = time.perf_counter()
+        features = build_features(int(row.age), row.height, row.weight, row.ap_hi, row.ap_lo,
+                                  row.cholesterol, row.gluc, row.smoke, row.alco, row.active, bmi)
+        built = time.perf_counter()
+        # The original handler: predict() then predict_proba() on the same frame
+        model.predict(features)[0]
+        model.predict_proba(features)[0]
+        legacy_done = time.perf_counter()
+        predict_with_proba(model, features)
+        done = time.perf_counter()
+        build.append(built - start)
+        legacy.append(legacy_done - built)
+        single_pass.append(done - legacy_done)
+
+    encoder = FeatureEncoder(model)
+    encode, encoded = [], []
+    for row in rows.itertuples(index=False):
+        start = time.perf_counter()
+        features = encoder.encode_one(int(row.age), row.height, row.weight, row.ap_hi, row.ap_lo,
+                                      row.cholesterol, row.gluc, row.smoke, row.alco, row.active)
+        built = time.perf_counter()
+        predict_with_proba(encoder.model, features)
+        done = time.perf_counter()
+        encode.append(built - start)
+        encoded.append(done - built)
+    return {
+        'rows': len(rows),
+        'build_frame_ms': percentiles(build),
+        'legacy_ms': percentiles(legacy),
+        'single_pass_ms': percentiles(single_pass),
+        'encode_ms': percentiles(encode),
+        'encoded_single_pass_ms': percentiles(encoded),
+    }
+
+
+def bench_batches(model, data, batch_sizes):
+    """Rows per second of build_feature_frame + predict_with_proba per batch size."""
+    from inference import build_feature_frame, predict_with_proba
+    results = {}
+    for size in batch_sizes:
+        batch = data.sample(size, replace=size > len(data), random_state=size)
+        repeat = max(3, min(30, 20_000 // size))
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            predict_with_proba(model, build_feature_frame(batch))
+            times.append(time.perf_counter() - start)
+        results[str(size)] = {'rows_per_second': round(size / float(np.median(times)), 1),
+                              'batch_ms': percentiles(times)}
+    return results
+
+
+def bench_service(model, rows, clients=16):
+    """Throughput and latency of the serve.py micro-batcher under concurrent clients."""
+    from serve import INPUT_FIELDS, MicroBatcher
+    batcher = MicroBatcher(model)
+    records = rows[INPUT_FIELDS].astype(float).to_dict('records')
+    chunks = [records[i::clients] for i in range(clients)]
+
+    def client(chunk):
+        for record in chunk:
+            batcher.predict(record)
+
+    threads = [threading.Thread(target=client, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return dict(batcher.stats(), clients=clients,
+                throughput_rps=round(len(records) / seconds, 1))
+
+
+def run_backend(name, args):
+    """Benchmark one back end inside the current (fresh) process."""
+    start = time.perf_counter()
+    model = load_backend(name, args)
+    load_seconds = time.perf_counter() - start
+    rss_after_load = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    rows = sample_inputs(args.data, args.rows)
+    result = {
+        'backend': name,
+        'load_seconds': round(load_seconds, 4),
+        'rss_after_load_mb': round(rss_after_load / 1024, 1),
+        'app_path': bench_app_path(model, rows),
+        'batch': bench_batches(model, sample_inputs(args.data, max(args.batch_sizes)),
+                               args.batch_sizes),
+        'service': bench_service(model, sample_inputs(args.data, args.service_requests, seed=1)),
+    }
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def run_all(args):
+    from dataset import file_sha256
+    import sklearn
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'model': args.model,
+        'model_sha256': file_sha256(args.model),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'cpu_count': os.cpu_count(),
+        'backends': {},
+    }
+    for name in args.backends:
+        if name == 'compiled-artifact' and not os.path.isdir(args.compiled):
+            print(f"Skipping {name}: {args.compiled} not found", file=sys.stderr)
+            continue
+        command = [sys.executable, '-m', 'benchmarks.bench_inference', '--worker', name,
+                   '--model', args.model, '--compiled', args.compiled, '--data', args.data,
+                   '--rows', str(args.rows), '--service-requests', str(args.service_requests),
+                   '--batch-sizes', *map(str, args.batch_sizes)]
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        report['backends'][name] = json.loads(output)
+    return report
+
+
+def lookup(result, dotted):
+    for key in dotted.split('.'):
+        result = result[key]
+    return result
+
+
+def compare(old_path, new_path):
+    """Print the change of the key metrics between two result files."""
+    with open(old_path) as file:
+        old = json.load(file)
+    with open(new_path) as file:
+        new = json.load(file)
+    for backend in sorted(set(old['backends']) & set(new['backends'])):
+        print(f"{backend}:")
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before = lookup(old['backends'][backend], metric)
+            after = lookup(new['backends'][backend], metric)
+            change = (after - before) / before if before else 0.0
+            regressed = change < 0 if higher_is_better else change > 0
+            flag = '  (worse)' if regressed and abs(change) > 0.05 else ''
+            print(f"  {metric:<30} {before:>12} -> {after:>12}  {change:+.1%}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inference benchmark suite")
+    parser.add_argument('--model', default='model.pkl')
+    parser.add_argument('--compiled', default='model_compiled')
+    parser.add_argument('--data', default='cardio_train.csv')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--rows', type=int, default=500, help="Single-row calls on the app path")
+    parser.add_argument('--service-requests', type=int, default=2000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument('--output', default='-', help="JSON result path (default: stdout)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="Compare two result files instead of running")
+    parser.add_argument('--worker', choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.worker:
+        json.dump(run_backend(args.worker, args), sys.stdout)
+        return
+
+    report = run_all(args)
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
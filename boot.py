@@ -0,0 +1,137 @@
+"""Start the app with its imports done and the model warm before the first visitor.
+
+``streamlit run app.py`` imports and loads lazily: the first session pays for
+importing the libraries, loading (or unpickling) the model, touching its
+trees and the first chart render, which shows up as a latency spike after
+every restart. This launcher does that work up front. It imports the heavy
+modules, then runs the app script once in-process and makes a dummy
+prediction (plus a what-if curve). That fills the process-wide resource
+caches (model, encoder, registry watcher, worker pool, risk table) that
+every session of the server shares. Only then does it start the server.
+
+It prints how long each import and each warm-up step took, and the slowest
+observation of every app phase (see metrics.py) during the warm-up, which is
+the cost the first visitor would otherwise have seen. If the warm-up fails
+(e.g. the model is missing) the server is not started, so a rolling restart
+never routes traffic to a broken process.
+
+Usage:
+    python boot.py                                  # same as `streamlit run app.py`
+    python boot.py --report boot.json --server.port 8502
+    python boot.py --no-serve                       # warm-up breakdown only
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+# Imported before the warm-up, in dependency order, so each is timed on its own
+BOOT_IMPORTS = (
+    'numpy', 'pandas', 'streamlit', 'compiled_model', 'inference', 'validation',
+    'recommendations', 'metrics', 'prediction_cache', 'lookup_table', 'model_host',
+    'model_registry', 'worker_pool', 'streamlit.testing.v1',
+)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def timed_imports(modules=BOOT_IMPORTS):
+    """Import ``modules`` in order; returns milliseconds per module."""
+    timings = {}
+    for name in modules:
+        t0 = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = _ms(time.perf_counter() - t0)
+    return timings
+
+
+def _check(app, step):
+    problems = [str(e.value) for e in app.exception] + [str(e.value) for e in app.error]
+    if problems:
+        raise RuntimeError(f"App warm-up failed at {step}: {'; '.join(problems)}")
+
+
+def warm_up(app_path=APP_PATH, timeout=120.0):
+    """Run the app once in-process and make a dummy prediction.
+
+    Returns milliseconds per warm-up step and the slowest observation of
+    each app phase in milliseconds. Raises ``RuntimeError`` if the app
+    shows an error.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(app_path, default_timeout=timeout)
+    # The admin table carries the app's own phase timings
+    app.query_params['admin'] = '1'
+    steps = {}
+
+    def step(name, run):
+        t0 = time.perf_counter()
+        run()
+        steps[name] = _ms(time.perf_counter() - t0)
+        _check(app, name)
+
+    step('first_run', app.run)
+    step('first_prediction', lambda: app.button[0].click().run())
+    step('what_if', lambda: app.toggle[0].set_value(True).run())
+    # Another profile, so the prediction cache misses as for a new visitor
+    app.toggle[0].set_value(False)
+    app.number_input[0].set_value(app.number_input[0].value + 1)
+    step('warm_prediction', lambda: app.button[0].click().run())
+
+    timings = app.dataframe[0].value
+    phases = {name: round(float(value), 1) for name, value in timings['max'].items()}
+    return steps, phases
+
+
+def print_report(report):
+    print("Imports (ms):")
+    for name, ms in report['imports_ms'].items():
+        print(f"  {name:<24} {ms:>8.1f}")
+    print(f"  {'total':<24} {sum(report['imports_ms'].values()):>8.1f}")
+    print("Warm-up (ms):")
+    for name, ms in report['warmup_ms'].items():
+        print(f"  {name:<24} {ms:>8.1f}")
+    print("Slowest app phases during warm-up (ms):")
+    for name, ms in sorted(report['phases_ms'].items(), key=lambda item: -item[1]):
+        print(f"  {name:<24} {ms:>8.1f}")
+    print(f"Ready in {report['boot_ms']:.0f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Warm the app up, then serve it; other options are passed to `streamlit run`")
+    parser.add_argument('--report', help="Also write the startup breakdown as JSON")
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help="Seconds each warm-up run may take")
+    parser.add_argument('--no-serve', action='store_true', help="Stop after the warm-up")
+    args, streamlit_args = parser.parse_known_args(argv)
+
+    t0 = time.perf_counter()
+    report = {'imports_ms': timed_imports()}
+    try:
+        report['warmup_ms'], report['phases_ms'] = warm_up(APP_PATH, args.timeout)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    report['boot_ms'] = _ms(time.perf_counter() - t0)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.no_serve:
+        return
+
+    # Same process, so the server's sessions find everything cached
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', APP_PATH, *streamlit_args]
+    sys.exit(cli.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""Pickle-free, NumPy-only form of the trained bagging ensemble.
+
+``export_model`` flattens every decision tree of a fitted ``BaggingClassifier``
+into a few concatenated arrays (split feature, threshold, children and
+per-node class probabilities) and saves them as ``.npy`` files that can be
+memory-mapped. ``load_compiled`` reads them back into a ``CompiledEnsemble``
+whose ``predict_proba`` gives bit-identical results to the original model
+without importing scikit-learn. ``compile_model`` does the same conversion in
+memory for an already loaded model.
+
+A reduced ``precision`` stores node indices as int32, feature indices as
+uint8 and thresholds as float32, rounded down so every split sends each
+float32 input the same way as before. Node values are stored as float32, or
+quantized to uint16 or uint8. Only the probabilities change (float32 values
+by about 1e-7).
+
+``contributions`` splits each prediction into per-feature contributions by
+decomposing the decision paths (Saabas' method): every split a row passes
+through moves the tree's positive-class value by the difference between
+child and parent node, and that difference is credited to the split's
+feature. The path totals are precomputed per node, once per model, so
+attribution costs one extra lookup per tree on top of the forward pass.
+Exports store them too, so processes mapping the same export share them.
+
+Usage (after training):
+    export_model(model, 'model_compiled')
+    export_model(model, 'model_compact', precision='float32')
+
+    model = load_compiled('model_compiled')
+    model.predict_proba(features)
+    bias, contributions = model.contributions(features)   # bias + row sum == P(cardio)
+
+    python compiled_model.py model.pkl model_compact --precision uint16
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+
+FORMAT_VERSION = 3
+# Version 2 exports (float64 only, no 'precision') still load
+SUPPORTED_VERSIONS = (2, 3)
+PRECISIONS = ('float64', 'float32', 'uint16', 'uint8')
+METADATA_FILE = 'metadata.json'
+ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+# Derived arrays saved with an export when available; older exports lack them
+OPTIONAL_ARRAYS = ('node_contributions',)
+
+# sklearn's marker for "no child" in tree_.children_left/right
+TREE_LEAF = -1
+
+# Stop compacting the working set until fewer than this share of the
+# (row, tree) pairs are still moving; compaction is not free
+COMPACT_FRACTION = 0.5
+
+
+def flatten_ensemble(model):
+    """Return the concatenated node arrays and metadata for ``model``.
+
+    Node indices of every tree are shifted so that all trees live in one set of
+    arrays; ``roots[i]`` is the index of the root node of tree ``i``. Both
+    children of a leaf point back at the leaf itself, so a walk that reached
+    a leaf stays there. Feature indices are mapped back to the columns of the
+    full feature frame, and node values are stored as normalised class
+    probabilities, the same way ``DecisionTreeClassifier.predict_proba``
+    computes them.
+    """
+    n_classes = len(model.classes_)
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator, columns in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        is_leaf = tree.children_left == TREE_LEAF
+        node_ids = np.arange(tree.node_count) + offset
+
+        feature = np.asarray(columns)[np.where(is_leaf, 0, tree.feature)]
+        feature[is_leaf] = 0
+
+        proba = tree.value[:, 0, :len(estimator.classes_)].copy()
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba /= normalizer
+        value = np.zeros((tree.node_count, n_classes))
+        value[:, np.asarray(estimator.classes_, dtype=np.intp)] = proba
+
+        features.append(feature)
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        values.append(value)
+        roots.append(offset)
+        offset += tree.node_count
+
+    arrays = {
+        'feature': np.concatenate(features).astype(np.intp),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.intp),
+        'right': np.concatenate(rights).astype(np.intp),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.intp),
+    }
+    feature_names = getattr(model, 'feature_names_in_', None)
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'classes': np.asarray(model.classes_).tolist(),
+        'n_features': int(model.n_features_in_),
+        'feature_names': None if feature_names is None else list(feature_names),
+        'n_estimators': len(model.estimators_),
+    }
+    return arrays, metadata
+
+
+def reduce_precision(arrays, metadata, precision):
+    """Return compact copies of the node arrays and their metadata.
+
+    See the module docstring for what each ``precision`` stores.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, not {precision!r}")
+    if precision == 'float64':
+        return arrays, dict(metadata, precision=precision)
+    threshold = arrays['threshold'].astype(np.float32)
+    # Round to the largest float32 not above the float64 threshold: for a
+    # float32 x, x <= float64 t exactly when x <= that value
+    above = threshold.astype(np.float64) > arrays['threshold']
+    threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+    compact = {
+        'feature': arrays['feature'].astype(np.min_scalar_type(metadata['n_features'])),
+        'threshold': threshold,
+        'left': arrays['left'].astype(np.int32),
+        'right': arrays['right'].astype(np.int32),
+        'roots': arrays['roots'].astype(np.int32),
+    }
+    if precision == 'float32':
+        compact['value'] = arrays['value'].astype(np.float32)
+    else:
+        levels = np.iinfo(precision).max
+        compact['value'] = np.rint(arrays['value'] * levels).astype(precision)
+    return compact, dict(metadata, precision=precision)
+
+
+def array_bytes(model):
+    """Bytes held by the node arrays of a ``CompiledEnsemble``."""
+    return sum(getattr(model, name).nbytes for name in ARRAY_NAMES)
+
+
+def export_model(model, path, precision='float64'):
+    """Save ``model`` as a directory of memory-mappable ``.npy`` arrays."""
+    arrays, metadata = reduce_precision(*flatten_ensemble(model), precision)
+    arrays['node_contributions'] = CompiledEnsemble(arrays, metadata).node_contributions()
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), array)
+    with open(os.path.join(path, METADATA_FILE), 'w') as file:
+        json.dump(metadata, file, indent=2)
+    return path
+
+
+def compile_model(model, precision='float64'):
+    """Build a ``CompiledEnsemble`` from a fitted model without saving it.
+
+    The result is a drop-in replacement for ``model.predict_proba``.
+    """
+    return CompiledEnsemble(*reduce_precision(*flatten_ensemble(model), precision))
+
+
+def load_model_file(path):
+    """Load either an exported model directory or a pickled model as a ``CompiledEnsemble``."""
+    if os.path.isdir(path):
+        return load_compiled(path)
+    with open(path, 'rb') as file:
+        return compile_model(pickle.load(file))
+
+
+def load_compiled(path, mmap=True):
+    """Load an exported model directory as a ``CompiledEnsemble``."""
+    with open(os.path.join(path, METADATA_FILE)) as file:
+        metadata = json.load(file)
+    if metadata.get('format_version') not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported compiled model format in {path!r}: "
+                         f"{metadata.get('format_version')}")
+    mmap_mode = 'r' if mmap else None
+    names = ARRAY_NAMES + tuple(name for name in OPTIONAL_ARRAYS
+                                if os.path.isfile(os.path.join(path, f'{name}.npy')))
+    # Plain read-only views of the mapping: every operation on an np.memmap
+    # goes through its subclass hooks, which more than doubles the cost of
+    # a one-row prediction
+    arrays = {name: np.asarray(np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode))
+              for name in names}
+    return CompiledEnsemble(arrays, metadata)
+
+
+class CompiledEnsemble:
+    """NumPy evaluator for an exported bagging ensemble of decision trees."""
+
+    def __init__(self, arrays, metadata):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.classes_ = np.asarray(metadata['classes'])
+        self.n_features_in_ = metadata['n_features']
+        if metadata.get('feature_names') is not None:
+            self.feature_names_in_ = np.asarray(metadata['feature_names'], dtype=object)
+        self.n_estimators = metadata['n_estimators']
+        self.precision = metadata.get('precision', 'float64')
+        # Quantized values are scaled back to probabilities when summed
+        self.value_scale = None
+        if np.issubdtype(self.value.dtype, np.integer):
+            self.value_scale = 1.0 / np.iinfo(self.value.dtype).max
+        # Class whose probability contributions() explains: cardio=1 when present
+        positive = np.flatnonzero(self.classes_ == 1)
+        self.positive_index = int(positive[0]) if positive.size else len(self.classes_) - 1
+        self._node_contributions = arrays.get('node_contributions')
+
+    def fingerprint(self):
+        """SHA-256 of the node arrays; identical models have identical fingerprints."""
+        digest = hashlib.sha256()
+        for array in (self.feature, self.threshold, self.left, self.right, self.value, self.roots):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def _validate(self, X):
+        columns = getattr(X, 'columns', None)
+        if columns is not None and hasattr(self, 'feature_names_in_'):
+            if list(columns) != list(self.feature_names_in_):
+                raise ValueError("Feature names must match those seen at fit time: "
+                                 f"{list(self.feature_names_in_)}")
+        # Trees compare float32 inputs against float64 thresholds, like sklearn
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[-1]} features, but the model "
+                             f"expects {self.n_features_in_}")
+        return X
+
+    def apply(self, X):
+        """Return the leaf reached by every row in every tree, shape (n, trees).
+
+        All trees are walked together one level at a time: each step advances
+        every unfinished (row, tree) pair with a handful of array operations.
+        Pairs that stopped moving have reached their leaf; they are dropped
+        from the working set once enough of them have piled up.
+        """
+        X = self._validate(X)
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        flat_X = X.ravel()
+        leaves = np.empty(n_rows * n_trees, dtype=np.intp)
+        # Pair k is (row k // n_trees, tree k % n_trees)
+        pairs = np.arange(n_rows * n_trees)
+        node = np.tile(self.roots, n_rows).astype(np.intp, copy=False)
+        offset = np.repeat(np.arange(n_rows) * self.n_features_in_, n_trees)
+        while True:
+            go_left = flat_X[offset + self.feature[node]] <= self.threshold[node]
+            # Compact models store int32 children; numpy casts non-intp index
+            # arrays on every use, so cast once per level instead
+            next_node = np.where(go_left, self.left[node], self.right[node]).astype(np.intp, copy=False)
+            moved = next_node != node
+            node = next_node
+            n_moved = np.count_nonzero(moved)
+            if n_moved == 0:
+                leaves[pairs] = node
+                break
+            if n_moved < COMPACT_FRACTION * node.size:
+                settled = ~moved
+                leaves[pairs[settled]] = node[settled]
+                pairs, node, offset = pairs[moved], node[moved], offset[moved]
+        return leaves.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        return self._proba(self.apply(X))
+
+    def _proba(self, leaves):
+        tree_proba = self.value[leaves]
+        proba = np.zeros((leaves.shape[0], len(self.classes_)))
+        # Accumulate tree by tree in estimator order, as BaggingClassifier does,
+        # so the floating point sums are bit-identical
+        for i in range(leaves.shape[1]):
+            proba += tree_proba[:, i]
+        if self.value_scale is not None:
+            proba *= self.value_scale
+        return proba / self.n_estimators
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def node_contributions(self):
+        """Per-node feature contributions accumulated from the root, shape (nodes, features).
+
+        Row ``j`` holds, for every feature, the change of the positive-class
+        value credited to that feature along the path from the tree's root to
+        node ``j``. Computed on first use and kept; the trees are walked one
+        level at a time, all trees together.
+        """
+        if self._node_contributions is not None:
+            return self._node_contributions
+        value = np.asarray(self.value[:, self.positive_index], dtype=np.float64)
+        if self.value_scale is not None:
+            value = value * self.value_scale
+        dtype = np.float64 if self.value.dtype == np.float64 else np.float32
+        n_nodes = len(value)
+        paths = np.zeros((n_nodes, self.n_features_in_), dtype=dtype)
+        is_internal = np.asarray(self.left) != np.arange(n_nodes)
+        parents = np.asarray(self.roots, dtype=np.intp)
+        while parents.size:
+            parents = parents[is_internal[parents]]
+            feature = np.asarray(self.feature[parents], dtype=np.intp)
+            children = []
+            for child in (self.left[parents], self.right[parents]):
+                child = child.astype(np.intp, copy=False)
+                paths[child] = paths[parents]
+                paths[child, feature] += value[child] - value[parents]
+                children.append(child)
+            parents = np.concatenate(children)
+        self._node_contributions = paths
+        return paths
+
+    def contributions(self, X):
+        """Split the positive-class probability of every row into (bias, contributions).
+
+        ``bias`` is the ensemble's value before any split (the mean root
+        value) and ``contributions`` has one column per feature; ``bias +
+        contributions.sum(axis=1)`` equals ``predict_proba(X)[:, positive]``
+        up to rounding.
+        """
+        return self._contributions(self.apply(X))
+
+    def explain(self, X):
+        """``predict_proba(X)`` and ``contributions(X)`` from a single walk of the trees.
+
+        Returns (proba, bias, contributions).
+        """
+        leaves = self.apply(X)
+        return (self._proba(leaves),) + self._contributions(leaves)
+
+    def _contributions(self, leaves):
+        paths = self.node_contributions()
+        contributions = np.zeros((leaves.shape[0], self.n_features_in_))
+        for i in range(leaves.shape[1]):
+            contributions += paths[leaves[:, i]]
+        contributions /= self.n_estimators
+        root_value = np.asarray(self.value[self.roots, self.positive_index], dtype=np.float64)
+        if self.value_scale is not None:
+            root_value = root_value * self.value_scale
+        return float(root_value.mean()), contributions
+
+
+def verify(reference, model, X):
+    """Compare ``model`` with ``reference`` on ``X``; returns agreement statistics."""
+    expected = reference.predict_proba(X)
+    proba = model.predict_proba(X)
+    labels_expected = reference.classes_.take(np.argmax(expected, axis=1))
+    labels = model.classes_.take(np.argmax(proba, axis=1))
+    return {
+        'rows': len(expected),
+        'label_mismatches': int(np.count_nonzero(labels != labels_expected)),
+        'max_abs_proba_diff': float(np.abs(proba - expected).max()),
+        'mean_abs_proba_diff': float(np.abs(proba - expected).mean()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a pickled model for fast, pickle-free inference")
+    parser.add_argument('model', help="Pickled model path")
+    parser.add_argument('output', help="Directory to write")
+    parser.add_argument('--precision', choices=PRECISIONS, default='float64')
+    parser.add_argument('--data', default='cardio_train.csv',
+                        help="Raw records to verify predictions on ('' to skip)")
+    args = parser.parse_args(argv)
+
+    with open(args.model, 'rb') as file:
+        model = pickle.load(file)
+    export_model(model, args.output, args.precision)
+
+    full = compile_model(model)
+    compact = load_compiled(args.output, mmap=False)
+    full_bytes, compact_bytes = array_bytes(full), array_bytes(compact)
+    print(f"pickle {os.path.getsize(args.model) / 1e6:.1f} MB, float64 arrays {full_bytes / 1e6:.1f} MB, "
+          f"{args.precision} arrays {compact_bytes / 1e6:.1f} MB "
+          f"({1 - compact_bytes / os.path.getsize(args.model):.0%} smaller than the pickle)")
+
+    if args.data:
+        import pandas as pd
+        from inference import build_feature_frame
+        X = build_feature_frame(pd.read_csv(args.data, sep=None, engine='python'))
+        result = verify(model, compact, X)
+        print(f"{result['label_mismatches']} of {result['rows']} labels differ from the original model; "
+              f"max |probability difference| {result['max_abs_proba_diff']:.2e}")
+        if result['label_mismatches']:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
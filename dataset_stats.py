@@ -0,0 +1,320 @@
+"""One-pass, mergeable summary statistics of a dataset.
+
+``DatasetStats`` reads rows chunk by chunk and keeps small accumulators
+instead of the rows:
+
+- per column, the count of every distinct value split by class (``cardio``),
+  with float values rounded to ``DECIMALS`` places. Value counts, class
+  counts, histograms and quantiles all come from these; they are exact for
+  the integer-valued columns
+- the row count, mean vector and co-moment matrix of the numeric columns,
+  from which means, variances and the correlation matrix follow
+
+Two accumulators over different rows merge into the accumulator of all
+rows, so chunks are summarized independently and combined. ``refresh_stats``
+persists the accumulators next to the byte position of the source file
+they cover; when rows are appended to the file (``preprocess.py
+--append``), only the new bytes are parsed and merged in.
+
+Usage:
+    from dataset_stats import refresh_stats
+    stats = refresh_stats('Preprocessed_cardio_dataset.csv')
+    stats.correlation()
+    stats.quantile('age', 0.5)
+    stats.value_counts('cholesterol')
+
+    python dataset_stats.py Preprocessed_cardio_dataset.csv
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+STATS_DIR = '.dataset_stats'
+STATE_FILE = 'state.json'
+ARRAYS_FILE = 'accumulators.npz'
+FORMAT_VERSION = 1
+CLASS_COLUMN = 'cardio'
+# Float values are counted at this many decimal places
+DECIMALS = 2
+DEFAULT_CHUNK_SIZE = 200_000
+# Bytes before the covered position that must be unchanged for an
+# incremental update (a rewritten file triggers a full rebuild)
+CHECK_BYTES = 1 << 16
+
+
+def _merge_counts(values_a, counts_a, values_b, counts_b):
+    # Union of two sorted value sets, with the class counts of both added up
+    values = np.union1d(values_a, values_b)
+    counts = np.zeros((len(values), counts_a.shape[1]), dtype=np.int64)
+    counts[np.searchsorted(values, values_a)] += counts_a
+    counts[np.searchsorted(values, values_b)] += counts_b
+    return values, counts
+
+
+class DatasetStats:
+    """Mergeable accumulators over the rows of a table; see the module docstring."""
+
+    def __init__(self, class_column=CLASS_COLUMN):
+        self.class_column = class_column
+        self.classes = np.empty(0, dtype=np.int64)
+        self.rows = 0
+        # column -> (sorted distinct values, counts of shape (values, classes))
+        self.value_table = {}
+        self.numeric_columns = None
+        self.moment_rows = 0
+        self.mean = None
+        self.comoment = None
+
+    @classmethod
+    def from_frame(cls, df, class_column=CLASS_COLUMN, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Summarize an in-memory frame in one pass, ``chunk_size`` rows at a time."""
+        stats = cls(class_column)
+        for start in range(0, len(df), chunk_size):
+            stats.update(df.iloc[start:start + chunk_size])
+        return stats
+
+    def _add_classes(self, classes):
+        # Widen every count table when a chunk brings a class not seen before
+        classes = np.union1d(self.classes, classes)
+        if len(classes) != len(self.classes):
+            positions = np.searchsorted(classes, self.classes)
+            for column, (values, counts) in self.value_table.items():
+                widened = np.zeros((len(values), len(classes)), dtype=np.int64)
+                widened[:, positions] = counts
+                self.value_table[column] = (values, widened)
+            self.classes = classes
+
+    def update(self, df):
+        """Add the rows of ``df`` to the accumulators."""
+        if len(df) == 0:
+            return self
+        labels = df[self.class_column].to_numpy()
+        self._add_classes(np.unique(labels))
+        label_index = np.searchsorted(self.classes, labels)
+        n_classes = len(self.classes)
+
+        for column in df.columns:
+            values = df[column].to_numpy()
+            if values.dtype.kind == 'f':
+                values = np.round(values, DECIMALS)
+            elif values.dtype.kind not in 'iub':
+                values = values.astype(str)
+            distinct, inverse = np.unique(values, return_inverse=True)
+            counts = np.bincount(inverse * n_classes + label_index,
+                                 minlength=len(distinct) * n_classes).reshape(-1, n_classes)
+            if column in self.value_table:
+                distinct, counts = _merge_counts(*self.value_table[column], distinct, counts)
+            self.value_table[column] = (distinct, counts)
+
+        numeric = [c for c in df.columns if df[c].dtype.kind in 'iubf']
+        if self.numeric_columns is None:
+            self.numeric_columns = numeric
+        X = df[self.numeric_columns].to_numpy(dtype=np.float64)
+        # Rows with a missing value are left out of the moments
+        X = X[~np.isnan(X).any(axis=1)]
+        if len(X):
+            mean = X.mean(axis=0)
+            centered = X - mean
+            self._merge_moments(len(X), mean, centered.T @ centered)
+        self.rows += len(df)
+        return self
+
+    def _merge_moments(self, n, mean, comoment):
+        # Chan et al.'s pairwise update: exact and numerically stable
+        if self.moment_rows == 0:
+            self.moment_rows, self.mean, self.comoment = n, mean, comoment
+            return
+        total = self.moment_rows + n
+        delta = mean - self.mean
+        self.comoment = self.comoment + comoment + np.outer(delta, delta) * (self.moment_rows * n / total)
+        self.mean = self.mean + delta * (n / total)
+        self.moment_rows = total
+
+    def merge(self, other):
+        """Add the accumulators of ``other`` (over different rows) to these."""
+        self._add_classes(other.classes)
+        positions = np.searchsorted(self.classes, other.classes)
+        for column, (values, counts) in other.value_table.items():
+            widened = np.zeros((len(values), len(self.classes)), dtype=np.int64)
+            widened[:, positions] = counts
+            if column in self.value_table:
+                values, widened = _merge_counts(*self.value_table[column], values, widened)
+            self.value_table[column] = (values, widened)
+        if other.moment_rows:
+            if self.numeric_columns is None:
+                self.numeric_columns = other.numeric_columns
+            if other.numeric_columns != self.numeric_columns:
+                raise ValueError("Cannot merge statistics over different numeric columns")
+            self._merge_moments(other.moment_rows, other.mean, other.comoment)
+        self.rows += other.rows
+        return self
+
+    def value_counts(self, column, by_class=False):
+        """Rows per distinct value of ``column``, most frequent first.
+
+        With ``by_class`` a frame with one column per class, in value order.
+        """
+        values, counts = self.value_table[column]
+        if by_class:
+            return pd.DataFrame(counts, index=pd.Index(values, name=column), columns=self.classes)
+        totals = pd.Series(counts.sum(axis=1), index=pd.Index(values, name=column), name='count')
+        return totals.sort_values(ascending=False, kind='stable')
+
+    def class_counts(self):
+        """Rows per class."""
+        counts = next(iter(self.value_table.values()))[1].sum(axis=0)
+        return pd.Series(counts, index=pd.Index(self.classes, name=self.class_column), name='count')
+
+    def column_mean(self, column):
+        return float(self.mean[self.numeric_columns.index(column)])
+
+    def quantile(self, column, q):
+        """``q``-quantile of ``column``, interpolated like ``Series.quantile``."""
+        values, counts = self.value_table[column]
+        cumulative = np.cumsum(counts.sum(axis=1))
+        position = q * (cumulative[-1] - 1)
+        low, high = int(np.floor(position)), int(np.ceil(position))
+        # The sorted value at rank r is the first value whose cumulative count exceeds r
+        value_low = values[np.searchsorted(cumulative, low, side='right')]
+        value_high = values[np.searchsorted(cumulative, high, side='right')]
+        return float(value_low + (value_high - value_low) * (position - low))
+
+    def histogram(self, column, bins=10, by_class=False):
+        """``np.histogram``-style (counts, edges) of ``column``; counts per class with ``by_class``."""
+        values, counts = self.value_table[column]
+        edges = np.histogram_bin_edges(values, bins)
+        if by_class:
+            return np.stack([np.histogram(values, edges, weights=counts[:, i])[0]
+                             for i in range(len(self.classes))], axis=1), edges
+        return np.histogram(values, edges, weights=counts.sum(axis=1))[0], edges
+
+    def covariance(self):
+        return pd.DataFrame(self.comoment / (self.moment_rows - 1),
+                            index=self.numeric_columns, columns=self.numeric_columns)
+
+    def correlation(self):
+        """Pearson correlation matrix of the numeric columns, like ``df.corr()``."""
+        scale = np.sqrt(np.diag(self.comoment))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.outer(scale, scale)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=self.numeric_columns, columns=self.numeric_columns)
+
+    def save(self, stats_dir, state=None):
+        """Write the accumulators (and ``state``, e.g. the covered source position) to ``stats_dir``."""
+        os.makedirs(stats_dir, exist_ok=True)
+        arrays = {'classes': self.classes}
+        if self.moment_rows:
+            arrays.update(mean=self.mean, comoment=self.comoment)
+        columns = list(self.value_table)
+        for i, column in enumerate(columns):
+            arrays[f'values_{i}'], arrays[f'counts_{i}'] = self.value_table[column]
+        tmp_path = os.path.join(stats_dir, f'{ARRAYS_FILE}.{os.getpid()}.tmp.npz')
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, os.path.join(stats_dir, ARRAYS_FILE))
+        metadata = dict(state or {}, format_version=FORMAT_VERSION, class_column=self.class_column,
+                        rows=self.rows, columns=columns, numeric_columns=self.numeric_columns,
+                        moment_rows=self.moment_rows)
+        tmp_path = os.path.join(stats_dir, f'{STATE_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(metadata, file, indent=2)
+        os.replace(tmp_path, os.path.join(stats_dir, STATE_FILE))
+
+    @classmethod
+    def load(cls, stats_dir):
+        """Return (stats, saved state) from ``stats_dir``."""
+        with open(os.path.join(stats_dir, STATE_FILE)) as file:
+            state = json.load(file)
+        if state.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported statistics format in {stats_dir!r}")
+        stats = cls(state['class_column'])
+        stats.rows = state['rows']
+        stats.numeric_columns = state['numeric_columns']
+        stats.moment_rows = state['moment_rows']
+        with np.load(os.path.join(stats_dir, ARRAYS_FILE)) as arrays:
+            stats.classes = arrays['classes']
+            if stats.moment_rows:
+                stats.mean, stats.comoment = arrays['mean'], arrays['comoment']
+            for i, column in enumerate(state['columns']):
+                stats.value_table[column] = (arrays[f'values_{i}'], arrays[f'counts_{i}'])
+        return stats, state
+
+
+def _check_digest(source, position):
+    source.seek(max(0, position - CHECK_BYTES))
+    return hashlib.sha256(source.read(position - max(0, position - CHECK_BYTES))).hexdigest()
+
+
+def default_stats_dir(path):
+    return os.path.join(STATS_DIR, os.path.basename(path).replace('.', '_'))
+
+
+def refresh_stats(path, stats_dir=None, sep=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Statistics of the CSV file ``path``, updated from its saved accumulators.
+
+    Only bytes added to the file since the last call are parsed. If the
+    file shrank or the data before the saved position changed, the
+    statistics are rebuilt from scratch. A leading unnamed column (the row
+    index pandas writes) is treated as the index and not summarized.
+    """
+    stats_dir = stats_dir or default_stats_dir(path)
+    with open(path, 'rb') as source:
+        header_line = source.readline()
+        if sep is None:
+            sep = ';' if b';' in header_line else ','
+        header = header_line.decode().rstrip('\r\n').split(sep)
+        index_col = 0 if header[0] == '' else None
+        size = source.seek(0, os.SEEK_END)
+
+        stats, state = None, None
+        if os.path.isfile(os.path.join(stats_dir, STATE_FILE)):
+            try:
+                stats, state = DatasetStats.load(stats_dir)
+            except (ValueError, KeyError, OSError):
+                stats = None
+            if stats is not None and (state.get('sep') != sep or state['source_bytes'] > size
+                                      or state['check_sha256'] != _check_digest(source, state['source_bytes'])):
+                stats = None
+        if stats is None:
+            stats, state = DatasetStats(), {'source_bytes': len(header_line)}
+        if size > state['source_bytes']:
+            source.seek(state['source_bytes'])
+            for chunk in pd.read_csv(source, sep=sep, names=header, index_col=index_col,
+                                     chunksize=chunk_size):
+                stats.update(chunk)
+            stats.save(stats_dir, {'source': os.path.abspath(path), 'sep': sep, 'source_bytes': size,
+                                   'check_sha256': _check_digest(source, size)})
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summary statistics from incrementally updated accumulators")
+    parser.add_argument('input', nargs='?', default='Preprocessed_cardio_dataset.csv')
+    parser.add_argument('--stats-dir', help=f"Accumulator directory (default: under {STATS_DIR}/)")
+    parser.add_argument('--sep', help="Field separator (detected from the header by default)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = refresh_stats(args.input, args.stats_dir, args.sep, args.chunk_size)
+    seconds = time.perf_counter() - start
+
+    print(f"{stats.rows} rows")
+    print(stats.class_counts().to_string())
+    for column in stats.numeric_columns:
+        if column != stats.class_column:
+            print(f"{column:<12} mean {stats.column_mean(column):>9.2f}  "
+                  f"median {stats.quantile(column, 0.5):>9.2f}")
+    print(stats.correlation().round(2).to_string())
+    print(f"Statistics refreshed in {seconds:.3f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Shared inference helpers used by the Streamlit app and batch/API callers."""
+
+import copy
+import threading
+
+import numpy as np
+
+# Exact column order the model was trained on (see Prac02_Model_train.ipynb)
+FEATURE_COLUMNS = [
+    'Unnamed: 0', 'age', 'height', 'weight', 'ap_hi', 'ap_lo',
+    'cholesterol', 'gluc', 'smoke', 'alco', 'active', 'bmi',
+]
+# Raw patient inputs (BMI is derived from height and weight)
+INPUT_FIELDS = ['age', 'height', 'weight', 'ap_hi', 'ap_lo',
+                'cholesterol', 'gluc', 'smoke', 'alco', 'active']
+_INPUT_POSITIONS = [FEATURE_COLUMNS.index(field) for field in INPUT_FIELDS]
+# The inputs sit in one contiguous run of columns; a slice is the cheapest write
+_INPUT_SLICE = slice(_INPUT_POSITIONS[0], _INPUT_POSITIONS[-1] + 1)
+assert _INPUT_POSITIONS == list(range(_INPUT_SLICE.start, _INPUT_SLICE.stop))
+_AGE, _HEIGHT, _WEIGHT, _BMI = (FEATURE_COLUMNS.index(c) for c in ('age', 'height', 'weight', 'bmi'))
+
+
+def build_features(age, height, weight, ap_hi, ap_lo, cholesterol, gluc,
+                   smoke, alco, active, bmi):
+    """Build the one-row feature frame for a single patient."""
+    import pandas as pd
+    return pd.DataFrame([[
+        0,  # Unnamed: 0 (index column)
+        age,
+        height,
+        weight,
+        ap_hi,
+        ap_lo,
+        cholesterol,
+        gluc,
+        smoke,
+        alco,
+        active,
+        bmi,
+    ]], columns=FEATURE_COLUMNS)
+
+
+def build_feature_frame(df):
+    """Build the model feature frame for a batch of raw patient records.
+
+    ``df`` uses the column names of ``cardio_train.csv``. Age is truncated to
+    whole years as in preprocessing, and BMI is derived exactly as the app
+    does, but for the whole column at once.
+    """
+    import pandas as pd
+    height = df['height'].to_numpy(dtype=float)
+    weight = df['weight'].to_numpy(dtype=float)
+    features = pd.DataFrame({
+        'Unnamed: 0': np.zeros(len(df), dtype=np.int64),
+        'age': df['age'].to_numpy().astype(int),
+        'height': height,
+        'weight': weight,
+        'ap_hi': df['ap_hi'].to_numpy(),
+        'ap_lo': df['ap_lo'].to_numpy(),
+        'cholesterol': df['cholesterol'].to_numpy(),
+        'gluc': df['gluc'].to_numpy(),
+        'smoke': df['smoke'].to_numpy(),
+        'alco': df['alco'].to_numpy(),
+        'active': df['active'].to_numpy(),
+        'bmi': weight / ((height / 100) ** 2),
+    }, columns=FEATURE_COLUMNS)
+    return features
+
+
+def positive_class_index(model):
+    """Column of ``predict_proba`` output holding the cardio=1 probability."""
+    return int(np.flatnonzero(np.asarray(model.classes_) == 1)[0])
+
+
+def predict_with_proba(model, features):
+    """Run the model once and return (labels, probabilities).
+
+    The label is taken from the probabilities using ``model.classes_``, which
+    is exactly what ``BaggingClassifier.predict`` does internally, so the
+    ensemble is only evaluated a single time.
+    """
+    proba = model.predict_proba(features)
+    labels = np.asarray(model.classes_).take(np.argmax(proba, axis=1), axis=0)
+    return labels, proba
+
+
+def predict_with_contributions(model, features):
+    """Like ``predict_with_proba``, plus the feature attributions of every row.
+
+    Returns (labels, probabilities, bias, contributions) from a single pass
+    through a ``CompiledEnsemble`` (see ``CompiledEnsemble.explain``).
+    """
+    proba, bias, contributions = model.explain(features)
+    labels = np.asarray(model.classes_).take(np.argmax(proba, axis=1), axis=0)
+    return labels, proba, bias, contributions
+
+
+class FeatureEncoder:
+    """Encodes raw patient inputs straight into the model's feature array.
+
+    The model's column schema is checked once, here, instead of on every
+    call: inputs are written into a contiguous float32 array in
+    ``FEATURE_COLUMNS`` order (float32 is what the trees compare in), so no
+    DataFrame is built and no per-call column-name validation runs. For
+    scikit-learn models that validation is switched off on ``self.model``, a
+    shallow copy of the model without ``feature_names_in_`` (it shares the
+    fitted trees); score encoded arrays with ``encoder.model``. The model
+    passed in is left untouched, so DataFrame calls on it are still checked.
+    """
+
+    def __init__(self, model):
+        names = getattr(model, 'feature_names_in_', None)
+        if names is not None and list(names) != FEATURE_COLUMNS:
+            raise ValueError(f"Model was trained on columns {list(names)}, "
+                             f"expected {FEATURE_COLUMNS}")
+        if model.n_features_in_ != len(FEATURE_COLUMNS):
+            raise ValueError(f"Model expects {model.n_features_in_} features, "
+                             f"expected {len(FEATURE_COLUMNS)}")
+        if names is not None and type(model).__module__.startswith('sklearn.'):
+            model = copy.copy(model)
+            del model.feature_names_in_
+        self.model = model
+        self._local = threading.local()
+
+    def encode_one(self, age, height, weight, ap_hi, ap_lo, cholesterol, gluc,
+                   smoke, alco, active):
+        """Encode one patient into a (1, n_features) array.
+
+        The array is a buffer preallocated per thread and is overwritten by
+        the next call from the same thread.
+        """
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.zeros((1, len(FEATURE_COLUMNS)), dtype=np.float32)
+        values = row[0]
+        values[_INPUT_SLICE] = (int(age), height, weight, ap_hi, ap_lo,
+                                    cholesterol, gluc, smoke, alco, active)
+        values[_BMI] = weight / ((height / 100) ** 2)
+        return row
+
+    def encode_rows(self, inputs, out=None):
+        """Encode an (n, len(INPUT_FIELDS)) array of raw inputs.
+
+        Age is truncated to whole years and BMI derived for all rows at once,
+        exactly as ``build_feature_frame`` does.
+        """
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if out is None:
+            out = np.empty((len(inputs), len(FEATURE_COLUMNS)), dtype=np.float32)
+        out[:, 0] = 0  # Unnamed: 0 (index column)
+        out[:, _INPUT_SLICE] = inputs
+        out[:, _AGE] = np.trunc(inputs[:, 0])
+        height, weight = inputs[:, 1], inputs[:, 2]
+        out[:, _BMI] = weight / ((height / 100) ** 2)
+        return out
+
+    def encode_frame(self, df, out=None):
+        """Encode a frame (or dict of columns) with the raw input columns."""
+        inputs = np.column_stack([np.asarray(df[field], dtype=np.float64) for field in INPUT_FIELDS])
+        return self.encode_rows(inputs, out)
+
+
+def sweep_inputs(inputs, field, values):
+    """Raw input rows for a what-if sweep: ``inputs`` repeated with ``field`` set to each of ``values``.
+
+    Feed the result to ``FeatureEncoder.encode_rows``, which derives BMI for
+    all rows at once, so a height or weight sweep gets the matching BMI.
+    """
+    rows = np.repeat(np.asarray(inputs, dtype=np.float64)[np.newaxis, :], len(values), axis=0)
+    rows[:, INPUT_FIELDS.index(field)] = values
+    return rows
@@ -0,0 +1,264 @@
+"""Precomputed risk table for the app's discrete input domain.
+
+Every field of the app form is an integer inside fixed bounds (or a small
+categorical), and the trees only ever compare a feature against a finite set
+of split thresholds. Values that fall between the same pair of thresholds are
+routed identically by every tree, so each input axis collapses to a handful
+of equivalence classes. Height and weight are combined into one "body" axis
+because BMI is derived from both.
+
+The builder evaluates one representative per table cell in fixed-size tiles,
+writes the probabilities into a memory-mapped ``.npy`` file and checks a
+random sample of the domain against the live model. At runtime a prediction
+is a few small array lookups.
+
+Usage:
+    python lookup_table.py build --model model.pkl --out risk_table
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from compiled_model import load_model_file
+from inference import FEATURE_COLUMNS, INPUT_FIELDS
+from validation import RANGES
+
+# Form bounds of app.py (the validation ranges), in the order of the
+# model's feature columns
+DOMAIN = {column: RANGES[column] for column in INPUT_FIELDS}
+# Table axes; 'body' is the combined (height, weight, bmi) axis
+AXES = ['age', 'body', 'ap_hi', 'ap_lo', 'cholesterol', 'gluc', 'smoke', 'alco', 'active']
+
+DEFAULT_MAX_CELLS = 1_000_000_000
+DEFAULT_TILE_SIZE = 1 << 18
+METADATA_FILE = 'metadata.json'
+
+
+def compute_bmi(height, weight):
+    # Same expression as app.py, so the table sees exactly the app's BMI
+    return weight / ((height / 100) ** 2)
+
+
+def split_thresholds(model, column):
+    """Sorted unique thresholds the ensemble uses on feature ``column``."""
+    feature = FEATURE_COLUMNS.index(column)
+    internal = model.left != np.arange(len(model.left))
+    return np.unique(model.threshold[internal & (model.feature == feature)])
+
+
+def value_classes(thresholds, values):
+    """Equivalence class of each value: the number of thresholds below it.
+
+    A tree sends ``x`` left when ``x <= threshold``, so two values take the
+    same path through every tree exactly when no threshold lies in
+    ``[low, high)``. Inputs are compared as float32, like the trees do.
+    """
+    return np.searchsorted(thresholds, np.asarray(values, dtype=np.float32), side='left')
+
+
+def build_axes(model):
+    """Return ``{axis: (lookup, representatives)}`` for every table axis.
+
+    ``lookup`` maps a raw value (offset from the axis minimum) to its class
+    index; ``representatives`` holds one raw input per class. For the body axis
+    the lookup is 2-D (height, weight) and representatives are (height, weight)
+    pairs.
+    """
+    axes = {}
+    for column in AXES:
+        if column == 'body':
+            continue
+        low, high = DOMAIN[column]
+        values = np.arange(low, high + 1)
+        classes = value_classes(split_thresholds(model, column), values)
+        _, first, lookup = np.unique(classes, return_index=True, return_inverse=True)
+        axes[column] = (lookup.astype(np.int32), values[first])
+
+    heights = np.arange(DOMAIN['height'][0], DOMAIN['height'][1] + 1)
+    weights = np.arange(DOMAIN['weight'][0], DOMAIN['weight'][1] + 1)
+    height, weight = np.meshgrid(heights, weights, indexing='ij')
+    triples = np.stack([
+        value_classes(split_thresholds(model, 'height'), height.ravel()),
+        value_classes(split_thresholds(model, 'weight'), weight.ravel()),
+        value_classes(split_thresholds(model, 'bmi'), compute_bmi(height.ravel(), weight.ravel())),
+    ], axis=1)
+    _, first, lookup = np.unique(triples, axis=0, return_index=True, return_inverse=True)
+    representatives = np.stack([height.ravel()[first], weight.ravel()[first]], axis=1)
+    axes['body'] = (lookup.reshape(height.shape).astype(np.int32), representatives)
+    return axes
+
+
+def cell_features(axes, shape, cells):
+    """Feature matrix for the representatives of flat cell indices ``cells``."""
+    index = np.unravel_index(cells, shape)
+    X = np.zeros((len(cells), len(FEATURE_COLUMNS)))
+    for axis, classes in zip(AXES, index):
+        representatives = axes[axis][1]
+        if axis == 'body':
+            height, weight = representatives[classes].T
+            X[:, FEATURE_COLUMNS.index('height')] = height
+            X[:, FEATURE_COLUMNS.index('weight')] = weight
+            X[:, FEATURE_COLUMNS.index('bmi')] = compute_bmi(height, weight)
+        else:
+            X[:, FEATURE_COLUMNS.index(axis)] = representatives[classes]
+    return X
+
+
+def build_table(model, path, max_cells=DEFAULT_MAX_CELLS, tile_size=DEFAULT_TILE_SIZE):
+    """Evaluate ``model`` over the whole domain and save the table to ``path``."""
+    start = time.perf_counter()
+    axes = build_axes(model)
+    shape = tuple(len(axes[axis][1]) for axis in AXES)
+    n_cells = int(np.prod(shape, dtype=np.float64))
+    if n_cells > max_cells:
+        raise ValueError(f"Risk table would need {n_cells:,} cells (axes {dict(zip(AXES, shape))}), "
+                         f"more than the budget of {max_cells:,}; train a shallower model "
+                         f"or raise --max-cells")
+
+    os.makedirs(path, exist_ok=True)
+    positive = int(np.flatnonzero(model.classes_ == 1)[0])
+    probability = np.lib.format.open_memmap(os.path.join(path, 'probability.npy'), mode='w+',
+                                            dtype=np.float32, shape=shape)
+    label = np.lib.format.open_memmap(os.path.join(path, 'label.npy'), mode='w+',
+                                      dtype=np.uint8, shape=shape)
+    flat_probability, flat_label = probability.reshape(-1), label.reshape(-1)
+    # Evaluate tile by tile so memory stays bounded by tile_size
+    for begin in range(0, n_cells, tile_size):
+        cells = np.arange(begin, min(begin + tile_size, n_cells))
+        proba = model.predict_proba(cell_features(axes, shape, cells))
+        flat_probability[cells] = proba[:, positive]
+        flat_label[cells] = np.argmax(proba, axis=1)
+    probability.flush()
+    label.flush()
+    del probability, label, flat_probability, flat_label
+
+    for axis in AXES:
+        lookup, representatives = axes[axis]
+        np.save(os.path.join(path, f'{axis}_lookup.npy'), lookup)
+        np.save(os.path.join(path, f'{axis}_values.npy'), representatives)
+    metadata = {
+        'model_fingerprint': model.fingerprint(),
+        'classes': model.classes_.tolist(),
+        'domain': DOMAIN,
+        'shape': dict(zip(AXES, shape)),
+        'cells': n_cells,
+        'build_seconds': round(time.perf_counter() - start, 3),
+    }
+    with open(os.path.join(path, METADATA_FILE), 'w') as file:
+        json.dump(metadata, file, indent=2)
+    return metadata
+
+
+class RiskTable:
+    """Memory-mapped risk table answering predictions by index lookup."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, METADATA_FILE)) as file:
+            self.metadata = json.load(file)
+        self.classes_ = np.asarray(self.metadata['classes'])
+        self.probability = np.load(os.path.join(path, 'probability.npy'), mmap_mode='r')
+        self.label = np.load(os.path.join(path, 'label.npy'), mmap_mode='r')
+        self.lookups = {axis: np.load(os.path.join(path, f'{axis}_lookup.npy')) for axis in AXES}
+
+    def index(self, inputs):
+        """Table index of the raw input columns (any shape, in ``INPUT_FIELDS`` order).
+
+        Raises ``IndexError`` for values outside the form's bounds.
+        """
+        values = dict(zip(INPUT_FIELDS, (np.asarray(v, dtype=np.int64) for v in inputs)))
+        offsets = {column: values[column] - DOMAIN[column][0] for column in INPUT_FIELDS}
+        for column, offset in offsets.items():
+            if np.any(offset < 0) or np.any(values[column] > DOMAIN[column][1]):
+                raise IndexError(f"{column} is outside the table domain {DOMAIN[column]}")
+        index = []
+        for axis in AXES:
+            if axis == 'body':
+                index.append(self.lookups['body'][offsets['height'], offsets['weight']])
+            else:
+                index.append(self.lookups[axis][offsets[axis]])
+        return tuple(index)
+
+    def predict(self, *inputs):
+        """Return (label, cardio probability) for the raw form inputs."""
+        index = self.index(inputs)
+        return self.classes_[self.label[index]], self.probability[index]
+
+    def predict_proba(self, *inputs):
+        probability = np.asarray(self.probability[self.index(inputs)], dtype=np.float64)
+        return np.stack([1.0 - probability, probability], axis=-1)
+
+
+def load_table(path, model):
+    """Open the table at ``path`` if it was built from ``model``, else return None.
+
+    A table built over another input domain (see validation.RANGES) is
+    ignored as well, since its cells would be looked up at the wrong offsets.
+    """
+    if not os.path.isfile(os.path.join(path, METADATA_FILE)):
+        return None
+    table = RiskTable(path)
+    if table.metadata['model_fingerprint'] != model.fingerprint():
+        return None
+    if table.metadata['domain'] != {column: list(bounds) for column, bounds in DOMAIN.items()}:
+        return None
+    return table
+
+
+def verify_table(table, model, samples=100_000, seed=0):
+    """Compare the table with the live model on random points of the domain."""
+    rng = np.random.default_rng(seed)
+    inputs = [rng.integers(low, high + 1, size=samples) for low, high in DOMAIN.values()]
+    labels, probability = table.predict(*inputs)
+
+    X = np.zeros((samples, len(FEATURE_COLUMNS)))
+    for column, values in zip(INPUT_FIELDS, inputs):
+        X[:, FEATURE_COLUMNS.index(column)] = values
+    X[:, FEATURE_COLUMNS.index('bmi')] = compute_bmi(inputs[1], inputs[2])
+    proba = model.predict_proba(X)
+    expected = model.classes_.take(np.argmax(proba, axis=1))
+    positive = int(np.flatnonzero(model.classes_ == 1)[0])
+    error = np.abs(probability.astype(np.float64) - proba[:, positive])
+    return {
+        'samples': samples,
+        'label_mismatches': int(np.count_nonzero(labels != expected)),
+        'max_probability_error': float(error.max()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precomputed risk lookup table")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Build and verify the table")
+    build.add_argument('--model', default='model.pkl',
+                       help="Pickled model or exported model directory")
+    build.add_argument('--out', default='risk_table')
+    build.add_argument('--max-cells', type=float, default=DEFAULT_MAX_CELLS)
+    build.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE,
+                       help="Cells evaluated per model call (bounds memory use)")
+    build.add_argument('--verify-samples', type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    model = load_model_file(args.model)
+    try:
+        metadata = build_table(model, args.out, int(args.max_cells), args.tile_size)
+    except ValueError as e:
+        # Over the cell budget (e.g. an unpruned model)
+        build.error(str(e))
+    print(f"Built {metadata['cells']:,} cells {metadata['shape']} "
+          f"in {metadata['build_seconds']:.2f}s")
+    if args.verify_samples:
+        report = verify_table(RiskTable(args.out), model, args.verify_samples)
+        metadata['verification'] = report
+        with open(os.path.join(args.out, METADATA_FILE), 'w') as file:
+            json.dump(metadata, file, indent=2)
+        print(f"Verified {report['samples']:,} random inputs: "
+              f"{report['label_mismatches']} label mismatches, "
+              f"max probability error {report['max_probability_error']:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""In-process timing metrics with rolling histograms.
+
+Every timed phase keeps its most recent observations in a bounded window,
+plus lifetime count and sum. Snapshots can be shown in the app's admin panel,
+written to a JSON file or served in Prometheus text format.
+
+Usage:
+    metrics = MetricsRegistry()
+    with metrics.time('predict.model'):
+        model.predict_proba(features)
+
+    timer = PhaseTimer(metrics, 'rerun')
+    ...  # render the header
+    timer.lap('header')
+    timer.finish()
+
+    metrics.snapshot()
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_WINDOW = 5000
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class RollingHistogram:
+    """Recent observations of one metric (bounded) plus lifetime totals."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        values = np.asarray(self.values, dtype=float)
+        result = {'count': self.count, 'sum': round(self.total, 6)}
+        if values.size:
+            result['mean'] = round(float(values.mean()), 6)
+            for q, value in zip(QUANTILES, np.quantile(values, QUANTILES)):
+                result[f'p{round(q * 100)}'] = round(float(value), 6)
+            result['max'] = round(float(values.max()), 6)
+        return result
+
+
+class PhaseTimer:
+    """Times consecutive phases of a top-to-bottom script.
+
+    Each ``lap(name)`` records the time since the previous lap under
+    ``prefix.name``; ``finish()`` records the time since the timer started
+    under ``prefix.total``.
+    """
+
+    def __init__(self, registry, prefix):
+        self.registry = registry
+        self.prefix = prefix
+        self.start = self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.registry.observe(f'{self.prefix}.{name}', now - self._last)
+        self._last = now
+
+    def finish(self):
+        self.registry.observe(f'{self.prefix}.total', time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    """Thread-safe set of named rolling histograms, shared by all sessions."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = RollingHistogram(self.window)
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name):
+        """Record the wall time of the ``with`` block in seconds under ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def histogram(self, name):
+        with self._lock:
+            return self._histograms.get(name)
+
+    def snapshot(self):
+        """Summary of every metric, keyed by name."""
+        with self._lock:
+            return {name: histogram.summary()
+                    for name, histogram in sorted(self._histograms.items())}
+
+    def export_json(self, path):
+        """Atomically write the current snapshot to ``path``."""
+        payload = {'timestamp': time.time(), 'pid': os.getpid(), 'metrics': self.snapshot()}
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(payload, file, indent=2)
+        os.replace(tmp_path, path)
+
+    def maybe_export(self, path, interval=10.0):
+        """Export to ``path`` at most once every ``interval`` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_export < interval:
+                return False
+            self._last_export = now
+        self.export_json(path)
+        return True
+
+    def to_prometheus(self, prefix='cardio'):
+        """Render the snapshot in the Prometheus text exposition format."""
+        lines = []
+        for name, summary in self.snapshot().items():
+            metric = f"{prefix}_{name.replace('.', '_')}"
+            lines.append(f'# TYPE {metric} summary')
+            for q in QUANTILES:
+                key = f'p{round(q * 100)}'
+                if key in summary:
+                    lines.append(f'{metric}{{quantile="{q}"}} {summary[key]}')
+            lines.append(f"{metric}_sum {summary['sum']}")
+            lines.append(f"{metric}_count {summary['count']}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,228 @@
+"""One shared copy of the model for every server process on a host.
+
+``publish`` converts the model once into the pickle-free export (see
+compiled_model.py) in a directory on shared memory (``/dev/shm`` where it
+exists). ``attach`` maps those arrays read-only: no unpickling and no
+copy, and every process that attaches maps the same physical pages, so
+running more app processes (or prediction workers, see worker_pool.py)
+does not multiply the memory the trees take.
+
+Each publication goes to a directory named after the source model's size
+and mtime and is renamed into place complete; concurrent publishers
+serialize on a lock file, so the model is converted once no matter how many
+processes start together (with ``fcntl`` on POSIX, ``msvcrt`` on
+Windows). Older publications are removed; processes still mapping them
+keep their pages until they detach.
+
+``memory_usage`` reports the calling process's RSS together with its PSS
+(shared pages divided among the processes mapping them) and private
+memory, which is what shows the sharing.
+
+Usage:
+    python model_host.py publish model.pkl
+    python model_host.py bench model.pkl --processes 4     # private vs shared
+
+    from model_host import attach, publish
+    path = publish('model.pkl')
+    model = attach(path)
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows
+    import msvcrt
+    fcntl = resource = None
+
+from compiled_model import METADATA_FILE, export_model, load_compiled, load_model_file
+
+SHARED_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+DEFAULT_SHARED_DIR = os.path.join(SHARED_ROOT, 'cardio-model')
+LOCK_FILE = '.lock'
+
+
+def _publication_name(source):
+    stat = os.stat(source if not os.path.isdir(source) else os.path.join(source, METADATA_FILE))
+    key = f'{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}'
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _lock_exclusive(file):
+    # Held until ``file`` is closed
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return
+    # msvcrt gives up after about 10 s of waiting, so keep asking
+    while True:
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+
+def publish(source, shared_dir=DEFAULT_SHARED_DIR):
+    """Publish ``source`` (a pickled model or an export directory) once; returns its path.
+
+    A no-op when the same source was already published.
+    """
+    os.makedirs(shared_dir, exist_ok=True)
+    path = os.path.join(shared_dir, _publication_name(source))
+    if os.path.isfile(os.path.join(path, METADATA_FILE)):
+        return path
+    with open(os.path.join(shared_dir, LOCK_FILE), 'w') as lock:
+        _lock_exclusive(lock)
+        # Another process may have published while we waited for the lock
+        if not os.path.isfile(os.path.join(path, METADATA_FILE)):
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if os.path.isdir(source):
+                shutil.copytree(source, tmp_path)
+                # Exports written before attributions were stored lack their
+                # path totals; add them so they are shared as well
+                contributions_path = os.path.join(tmp_path, 'node_contributions.npy')
+                if not os.path.isfile(contributions_path):
+                    np.save(contributions_path, load_compiled(tmp_path).node_contributions())
+            else:
+                with open(source, 'rb') as file:
+                    export_model(pickle.load(file), tmp_path)
+            os.replace(tmp_path, path)
+        for name in os.listdir(shared_dir):
+            if name not in (os.path.basename(path), LOCK_FILE):
+                shutil.rmtree(os.path.join(shared_dir, name), ignore_errors=True)
+    return path
+
+
+def attach(path):
+    """Map a published model read-only; returns a ``CompiledEnsemble``."""
+    return load_compiled(path, mmap=True)
+
+
+def memory_usage():
+    """Memory of the calling process in MB: RSS, PSS and private (unshared) memory.
+
+    PSS and private memory come from ``/proc/self/smaps_rollup`` and are
+    None where it is not available; so is the peak RSS on Windows.
+    """
+    usage = {'rss_mb': None, 'pss_mb': None, 'private_mb': None, 'peak_rss_mb': None}
+    if resource is not None:
+        usage['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            fields = dict(line.split(':', 1) for line in file if ':' in line and not line[0].isdigit())
+    except OSError:
+        return usage
+    kb = {name: int(value.split()[0]) for name, value in fields.items()}
+    usage['rss_mb'] = round(kb['Rss'] / 1024, 1)
+    usage['pss_mb'] = round(kb['Pss'] / 1024, 1)
+    usage['private_mb'] = round((kb['Private_Clean'] + kb['Private_Dirty']) / 1024, 1)
+    return usage
+
+
+def _bench_process(mode, path, n_requests, ready, start, results):
+    from inference import FeatureEncoder
+    t0 = time.perf_counter()
+    model = attach(path) if mode == 'shared' else load_model_file(path)
+    load_seconds = time.perf_counter() - t0
+    encoder = FeatureEncoder(model)
+    rows = np.random.default_rng(os.getpid()).integers(
+        [30, 150, 50, 100, 60, 0, 0, 0, 0, 0], [70, 200, 120, 180, 100, 4, 4, 2, 2, 2],
+        size=(n_requests, 10))
+    # Warm up as the app does at load, then wait for the others
+    model.predict_proba(encoder.encode_rows(rows[:256]))
+    model.node_contributions()
+    ready.wait()
+    start.wait()
+    t0 = time.perf_counter()
+    for row in rows:
+        model.predict_proba(encoder.encode_one(*row))
+    results.put(dict(memory_usage(), load_ms=round(load_seconds * 1000, 2),
+                     requests_per_second=round(n_requests / (time.perf_counter() - t0), 1)))
+    # Stay alive until every process has measured, so PSS reflects the sharing
+    start.wait()
+
+
+def bench(source, processes, n_requests, shared_dir):
+    """Start ``processes`` model-holding processes per mode; returns their reports."""
+    report = {}
+    context = multiprocessing.get_context('spawn')
+    for mode in ('private', 'shared'):
+        if mode == 'shared':
+            t0 = time.perf_counter()
+            path = publish(source, shared_dir)
+            report['publish_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+        else:
+            path = source
+        ready, start = context.Barrier(processes + 1), context.Barrier(processes + 1)
+        results = context.Queue()
+        workers = [context.Process(target=_bench_process,
+                                   args=(mode, path, n_requests, ready, start, results))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        ready.wait()
+        start.wait()
+        reports = [results.get() for _ in workers]
+        start.wait()
+        for worker in workers:
+            worker.join()
+        report[mode] = {
+            'processes': reports,
+            'total_pss_mb': round(sum(r['pss_mb'] or 0 for r in reports), 1),
+            'total_requests_per_second': round(sum(r['requests_per_second'] for r in reports), 1),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host one shared copy of the model per machine")
+    parser.add_argument('--shared-dir', default=DEFAULT_SHARED_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish_parser = commands.add_parser('publish', help="Publish a model into shared memory")
+    publish_parser.add_argument('source', nargs='?', default='model.pkl',
+                                help="Pickled model or exported model directory")
+    bench_parser = commands.add_parser('bench', help="Compare private and shared hosting")
+    bench_parser.add_argument('source', nargs='?', default='model.pkl')
+    bench_parser.add_argument('--processes', type=int, default=4)
+    bench_parser.add_argument('--requests', type=int, default=2000,
+                              help="Single-row predictions per process")
+    bench_parser.add_argument('--output', help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == 'publish':
+        t0 = time.perf_counter()
+        path = publish(args.source, args.shared_dir)
+        t1 = time.perf_counter()
+        attach(path)
+        t2 = time.perf_counter()
+        print(f"Published {args.source} at {path} in {(t1 - t0) * 1000:.0f} ms; "
+              f"attach takes {(t2 - t1) * 1000:.1f} ms")
+        return
+
+    report = bench(args.source, args.processes, args.requests, args.shared_dir)
+    for mode in ('private', 'shared'):
+        result = report[mode]
+        print(f"{mode}: {len(result['processes'])} processes, total PSS {result['total_pss_mb']} MB, "
+              f"{result['total_requests_per_second']:,.0f} requests/s")
+        for process in result['processes']:
+            print(f"  load {process['load_ms']:>8.1f} ms  RSS {process['rss_mb']} MB  "
+                  f"PSS {process['pss_mb']} MB  private {process['private_mb']} MB")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
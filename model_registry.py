@@ -0,0 +1,269 @@
+"""Local versioned model registry with background hot reload.
+
+Every published model is an immutable version directory:
+
+    model_registry/
+        versions/<version>/
+            model_compiled/   pickle-free export (see compiled_model.py)
+            model.pkl         the original pickle
+            metadata.json     feature order, fingerprint, training report
+        CURRENT               name of the version to serve
+
+A version is written under a temporary name and renamed into place, and
+CURRENT is replaced atomically, so readers never see a half-written model.
+``ModelWatcher`` polls CURRENT, loads a new version on a background thread
+and swaps it in with a single reference assignment. Predictions already
+running keep the model they started with. At most two models are resident:
+the active one and the one being loaded.
+
+Usage:
+    from model_registry import publish
+    publish(model, 'model_registry', report={'test_accuracy': 0.71})
+
+    python model_registry.py list
+    python model_registry.py promote <version>      # roll back or forward
+"""
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+
+from compiled_model import PRECISIONS, compile_model, export_model, load_compiled
+from inference import FEATURE_COLUMNS, FeatureEncoder
+
+REGISTRY_DIR = 'model_registry'
+VERSIONS_DIR = 'versions'
+CURRENT_FILE = 'CURRENT'
+METADATA_FILE = 'metadata.json'
+COMPILED_DIR = 'model_compiled'
+PICKLE_FILE = 'model.pkl'
+
+
+def version_path(registry_dir, version):
+    return os.path.join(registry_dir, VERSIONS_DIR, version)
+
+
+def publish(model, registry_dir=REGISTRY_DIR, report=None, activate=True, precision='float64'):
+    """Store a fitted model as a new version and (by default) make it current.
+
+    ``precision`` is that of the compiled export the app loads (see
+    compiled_model.py). Returns the version name.
+    """
+    # dataset.py needs pandas, which serving a model otherwise does not
+    from dataset import file_sha256
+    fingerprint = compile_model(model).fingerprint()
+    created_at = datetime.now(timezone.utc)
+    version = f"{created_at:%Y%m%dT%H%M%SZ}-{fingerprint[:8]}"
+    path = version_path(registry_dir, version)
+    if os.path.isdir(path):
+        raise ValueError(f"Version {version} already exists in {registry_dir!r}")
+
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    export_model(model, os.path.join(tmp_path, COMPILED_DIR), precision)
+    with open(os.path.join(tmp_path, PICKLE_FILE), 'wb') as file:
+        pickle.dump(model, file)
+    metadata = {
+        'version': version,
+        'created_at': created_at.isoformat(timespec='seconds'),
+        'feature_columns': [str(c) for c in getattr(model, 'feature_names_in_', ())],
+        'fingerprint': fingerprint,
+        'model_sha256': file_sha256(os.path.join(tmp_path, PICKLE_FILE)),
+        'n_estimators': len(model.estimators_),
+        'precision': precision,
+        'report': report or {},
+    }
+    with open(os.path.join(tmp_path, METADATA_FILE), 'w') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(tmp_path, path)
+
+    if activate:
+        set_current(registry_dir, version)
+    return version
+
+
+def set_current(registry_dir, version):
+    """Atomically point CURRENT at an existing version."""
+    if not os.path.isfile(os.path.join(version_path(registry_dir, version), METADATA_FILE)):
+        raise ValueError(f"Unknown model version {version!r} in {registry_dir!r}")
+    tmp_path = os.path.join(registry_dir, f'{CURRENT_FILE}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as file:
+        file.write(version + '\n')
+    os.replace(tmp_path, os.path.join(registry_dir, CURRENT_FILE))
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """Name of the version CURRENT points at, or None for an empty registry."""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILE)) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_metadata(registry_dir, version):
+    with open(os.path.join(version_path(registry_dir, version), METADATA_FILE)) as file:
+        return json.load(file)
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Metadata of every complete version, oldest first."""
+    versions_dir = os.path.join(registry_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    return [read_metadata(registry_dir, name) for name in sorted(os.listdir(versions_dir))
+            if not name.endswith('.tmp')]
+
+
+class LoadedModel:
+    """One registry version in memory: the model, its encoder and metadata.
+
+    ``path`` is the version's compiled model directory.
+    """
+
+    def __init__(self, version, model, encoder, metadata, path):
+        self.version = version
+        self.model = model
+        self.encoder = encoder
+        self.metadata = metadata
+        self.path = path
+
+
+def load_version(registry_dir, version):
+    """Load ``version`` and check it against the app's feature schema."""
+    metadata = read_metadata(registry_dir, version)
+    if metadata['feature_columns'] != FEATURE_COLUMNS:
+        raise ValueError(f"Model version {version} expects features {metadata['feature_columns']}, "
+                         f"the app provides {FEATURE_COLUMNS}")
+    path = os.path.join(version_path(registry_dir, version), COMPILED_DIR)
+    model = load_compiled(path)
+    encoder = FeatureEncoder(model)
+    # Touch every tree once so the first real request doesn't pay for page faults
+    model.predict_proba(encoder.encode_one(50, 170, 70, 120, 80, 1, 1, 0, 0, 1))
+    # Precompute the path totals behind the feature attributions
+    model.node_contributions()
+    return LoadedModel(version, model, encoder, metadata, path)
+
+
+class ModelWatcher:
+    """Serves the current registry version and hot-swaps new ones.
+
+    ``current()`` is a plain attribute read, so callers never block on a
+    reload. A new version is loaded only after the model it replaced last
+    time has been released by every caller, which caps memory at two models.
+    A version that fails to load is skipped until CURRENT changes again.
+    """
+
+    def __init__(self, registry_dir=REGISTRY_DIR, poll_interval=2.0, release_timeout=30.0):
+        self.registry_dir = registry_dir
+        self.poll_interval = poll_interval
+        self.release_timeout = release_timeout
+        self.swaps = 0
+        self.last_error = None
+        self._active = None
+        self._retired = None
+        self._failed_version = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.check()
+        self._thread = threading.Thread(target=self._poll, name='model-watcher', daemon=True)
+        self._thread.start()
+
+    def current(self):
+        """The active ``LoadedModel``, or None while the registry is empty."""
+        return self._active
+
+    def check(self):
+        """Load and swap in the CURRENT version if it changed; True on a swap."""
+        with self._lock:
+            version = current_version(self.registry_dir)
+            active = self._active
+            if version is None or version == self._failed_version \
+                    or (active is not None and version == active.version):
+                return False
+            del active
+            if not self._wait_for_release():
+                return False
+            try:
+                loaded = load_version(self.registry_dir, version)
+            except Exception as e:
+                self._failed_version = version
+                self.last_error = f"{version}: {e!r}"
+                print(f"Model version {version} not loaded: {e!r}", file=sys.stderr)
+                return False
+
+            retired, self._active = self._active, loaded
+            if retired is not None:
+                # Callers may keep just the model (and its encoder), not the wrapper
+                self._retired = weakref.ref(retired.model)
+            self._failed_version = None
+            self.swaps += 1
+            return True
+
+    def _wait_for_release(self):
+        # Requests started before the last swap may still hold the old model
+        deadline = time.monotonic() + self.release_timeout
+        while self._retired is not None and self._retired() is not None:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        self._retired = None
+        return True
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.last_error = repr(e)
+
+    def stop(self):
+        self._stop.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Versioned model registry")
+    parser.add_argument('--registry', default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="List versions (* marks the current one)")
+    publish_parser = commands.add_parser('publish', help="Add a pickled model as a new version")
+    publish_parser.add_argument('model', help="Pickled model path")
+    publish_parser.add_argument('--report', help="JSON training report to attach (see train.py)")
+    publish_parser.add_argument('--no-activate', action='store_true')
+    publish_parser.add_argument('--precision', choices=PRECISIONS, default='float64',
+                                help="Storage precision of the compiled export")
+    promote_parser = commands.add_parser('promote', help="Make an existing version current")
+    promote_parser.add_argument('version')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        current = current_version(args.registry)
+        for metadata in list_versions(args.registry):
+            marker = '*' if metadata['version'] == current else ' '
+            accuracy = {key: value for key, value in metadata['report'].items() if 'accuracy' in key}
+            print(f"{marker} {metadata['version']}  {metadata['n_estimators']} trees  {accuracy}")
+    elif args.command == 'publish':
+        with open(args.model, 'rb') as file:
+            model = pickle.load(file)
+        report = None
+        if args.report:
+            with open(args.report) as file:
+                report = json.load(file)
+        version = publish(model, args.registry, report, activate=not args.no_activate,
+                          precision=args.precision)
+        print(f"Published {version}")
+    else:
+        set_current(args.registry, args.version)
+        print(f"{args.version} is now current")
+
+
+if __name__ == '__main__':
+    main()
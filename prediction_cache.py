@@ -0,0 +1,106 @@
+"""Bounded LRU/TTL cache of predictions keyed on the patient's input values.
+
+The app's inputs are small integer ranges and categoricals, so the same
+profiles come up again and again; a cache hit skips the ensemble entirely.
+Entries are dropped automatically when the model files change.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def file_signature(*paths):
+    """Cheap fingerprint of ``paths`` (size and mtime); changes when a file is replaced."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            signature.append((path, None))
+        else:
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def make_key(values):
+    """Canonical cache key: the exact input values.
+
+    Values are not quantized: inputs that differ at all may get different
+    predictions (e.g. a weight of 120.6 vs 121.4 kg changes BMI) or
+    recommendations. ``1`` and ``1.0`` make the same key, so form integers
+    and JSON floats share entries.
+    """
+    return tuple(float(v) for v in values)
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with a time-to-live, shared across sessions."""
+
+    def __init__(self, maxsize=10_000, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def validate(self, signature):
+        """Clear the cache if the model ``signature`` changed since last call."""
+        with self._lock:
+            if signature != self._signature:
+                if self._signature is not None:
+                    self._entries.clear()
+                    self.invalidations += 1
+                self._signature = signature
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for ``key``, calling ``compute()`` on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,155 @@
+"""Declarative health-recommendation rules shared by the app, batch scoring and the API.
+
+Each rule is a list of conditions on the raw inputs (BMI is derived from
+height and weight, and age is truncated to whole years as the model sees
+it); a rule fires when any of its conditions holds. Over a
+batch the rules are evaluated as vectorized masks, and the result is one
+small integer per row whose bit ``i`` is set when rule ``i`` (in ``RULES``
+order) fired, so millions of rows cost a few array operations and one byte
+each. ``names`` and ``messages`` turn a bitset back into rules; there are
+only ``2 ** len(RULES)`` distinct bitsets, so both are cached.
+
+Usage:
+    from recommendations import recommend, recommend_frame, messages
+    bits = recommend_frame(chunk)          # one bitset per row
+    for text in messages(recommend(record)):
+        print(text)
+
+    python recommendations.py cardio_train.csv
+"""
+
+import argparse
+import functools
+import operator
+import sys
+import time
+
+import numpy as np
+
+# Rule name -> (conditions as (column, operator, value), message shown to the patient)
+RULES = {
+    'age': ([('age', '>', 50)],
+            "**Age Factor:** Regular check-ups are important at your age."),
+    'weight': ([('bmi', '>=', 25)],
+               "**Weight:** Consider maintaining a healthy BMI through diet and exercise."),
+    'blood_pressure': ([('ap_hi', '>', 140), ('ap_lo', '>', 90)],
+                       "**Blood Pressure:** Your BP is elevated. Consult a healthcare professional."),
+    'cholesterol': ([('cholesterol', '>=', 2)],
+                    "**Cholesterol:** High cholesterol levels. Discuss with your doctor about diet and medication."),
+    'glucose': ([('gluc', '>=', 2)],
+                "**Glucose:** High glucose levels. Regular monitoring is recommended."),
+    'smoking': ([('smoke', '==', 1)],
+                "**Smoking:** Consider quitting smoking to reduce cardiovascular risk."),
+    'exercise': ([('active', '==', 0)],
+                 "**Exercise:** Increase physical activity. Aim for 150 minutes of moderate activity per week."),
+}
+OPERATORS = {
+    '>': (np.greater, operator.gt),
+    '>=': (np.greater_equal, operator.ge),
+    '==': (np.equal, operator.eq),
+}
+RULE_NAMES = list(RULES)
+# Smallest unsigned type with a bit per rule (uint8 for up to 8 rules)
+BITS_DTYPE = np.min_scalar_type((1 << len(RULES)) - 1)
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+def _bmi(height, weight):
+    return weight / ((height / 100) ** 2)
+
+
+def _column(df, name):
+    if name == 'bmi' and 'bmi' not in df:
+        return _bmi(np.asarray(df['height'], dtype=np.float64),
+                    np.asarray(df['weight'], dtype=np.float64))
+    if name == 'age':
+        # Whole years, as FeatureEncoder.encode_rows gives the model
+        return np.trunc(np.asarray(df['age'], dtype=np.float64))
+    return np.asarray(df[name], dtype=np.float64)
+
+
+def recommend_frame(df, out=None):
+    """Recommendation bitset of every row of ``df`` (a frame or dict of columns).
+
+    ``df`` holds the raw input columns; BMI is derived unless a ``bmi``
+    column is present. Returns a ``BITS_DTYPE`` array, written into ``out``
+    if given.
+    """
+    columns = {column: _column(df, column)
+               for conditions, _ in RULES.values() for column, _, _ in conditions}
+    n = len(next(iter(columns.values())))
+    if out is None:
+        out = np.empty(n, dtype=BITS_DTYPE)
+    out[:] = 0
+    fired = np.empty(n, dtype=bool)
+    scratch = np.empty(n, dtype=bool)
+    for bit, (conditions, _) in enumerate(RULES.values()):
+        fired[:] = False
+        for column, op, value in conditions:
+            OPERATORS[op][0](columns[column], value, out=scratch)
+            fired |= scratch
+        np.bitwise_or(out, BITS_DTYPE.type(1 << bit), out=out, where=fired)
+    return out
+
+
+def recommend(record):
+    """Recommendation bitset of a single record (a mapping of raw inputs)."""
+    record = dict(record, age=int(record['age']))
+    if 'bmi' not in record:
+        record['bmi'] = _bmi(record['height'], record['weight'])
+    bits = 0
+    for bit, (conditions, _) in enumerate(RULES.values()):
+        if any(OPERATORS[op][1](record[column], value) for column, op, value in conditions):
+            bits |= 1 << bit
+    return bits
+
+
+@functools.lru_cache(maxsize=None)
+def names(bits):
+    """Names of the rules set in ``bits``, in ``RULES`` order."""
+    return tuple(name for bit, name in enumerate(RULE_NAMES) if int(bits) >> bit & 1)
+
+
+@functools.lru_cache(maxsize=None)
+def messages(bits):
+    """Patient-facing messages of the rules set in ``bits``."""
+    return tuple(RULES[name][1] for name in names(bits))
+
+
+def names_column(bits, sep='|'):
+    """``sep``-joined rule names per row, decoding each distinct bitset once."""
+    distinct, inverse = np.unique(bits, return_inverse=True)
+    labels = np.array([sep.join(names(value)) for value in distinct.tolist()], dtype=object)
+    return labels[inverse]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count recommendations over a raw dataset")
+    parser.add_argument('input', nargs='?', default='cardio_train.csv')
+    parser.add_argument('--sep', default=';')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    import pandas as pd
+
+    # Rows per distinct bitset; per-rule counts are decoded from these at the end
+    combinations = np.zeros(1 << len(RULES), dtype=np.int64)
+    rows = 0
+    seconds = 0.0
+    for chunk in pd.read_csv(args.input, sep=args.sep, chunksize=args.chunk_size):
+        start = time.perf_counter()
+        bits = recommend_frame(chunk)
+        seconds += time.perf_counter() - start
+        combinations += np.bincount(bits, minlength=len(combinations))
+        rows += len(chunk)
+
+    counts = dict.fromkeys(RULE_NAMES, 0)
+    for bits in np.flatnonzero(combinations).tolist():
+        for name in names(bits):
+            counts[name] += int(combinations[bits])
+    for name, count in counts.items():
+        print(f"{name:<16} {count:>10}  ({count / max(rows, 1):.1%})")
+    print(f"{rows} rows; rules evaluated at {rows / max(seconds, 1e-9):,.0f} rows/s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
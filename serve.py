@@ -0,0 +1,218 @@
+"""Lightweight local HTTP/JSON prediction service.
+
+Loads the model once and gathers concurrent single-patient requests into
+small batches, so each batch costs one vectorized ``predict_proba`` call.
+
+Usage:
+    python serve.py --port 8600
+
+    curl -s localhost:8600/predict -d '{"age": 55, "height": 170, "weight": 80,
+        "ap_hi": 140, "ap_lo": 90, "cholesterol": 1, "gluc": 1,
+        "smoke": 0, "alco": 0, "active": 1}'
+    curl -s localhost:8600/stats
+    curl -s localhost:8600/metrics    # Prometheus text format
+"""
+
+import argparse
+import json
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from compiled_model import compile_model
+from inference import INPUT_FIELDS, FeatureEncoder, positive_class_index, predict_with_proba
+from metrics import MetricsRegistry
+from prediction_cache import PredictionCache, make_key
+from recommendations import names, recommend_frame
+from validation import describe_rule, failed_rules
+
+
+class MicroBatcher:
+    """Collects single-row requests and scores them together.
+
+    The first request of a batch opens a window of ``max_wait_ms``; everything
+    that arrives before the window closes (up to ``max_batch`` rows) is scored
+    with one model call, and its recommendations with one pass over the rule
+    table.
+    """
+
+    def __init__(self, model, max_batch=64, max_wait_ms=5.0, metrics=None):
+        self.encoder = FeatureEncoder(model)
+        self.model = self.encoder.model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._positive = positive_class_index(model)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Queue one patient record; returns a Future of (label, probability, recommendation bits)."""
+        future = Future()
+        self._queue.put((record, future, time.perf_counter()))
+        return future
+
+    def predict(self, record, timeout=None):
+        return self.submit(record).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            records = [item[0] for item in batch]
+            try:
+                with self.metrics.time('service.model'):
+                    inputs = np.array([[record[field] for field in INPUT_FIELDS] for record in records])
+                    labels, probas = predict_with_proba(self.model, self.encoder.encode_rows(inputs))
+                    bits = recommend_frame(dict(zip(INPUT_FIELDS, inputs.T)))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            for i, (_, future, _) in enumerate(batch):
+                future.set_result((labels[i].item(), float(probas[i, self._positive]), int(bits[i])))
+            for _, _, submitted in batch:
+                self.metrics.observe('service.latency', done - submitted)
+            self.metrics.observe('service.batch_size', len(batch))
+
+    def stats(self):
+        latency = self.metrics.histogram('service.latency')
+        batch_size = self.metrics.histogram('service.batch_size')
+        result = {'requests': latency.count if latency else 0,
+                  'batches': batch_size.count if batch_size else 0}
+        if latency is not None:
+            summary = latency.summary()
+            result['latency_ms'] = {key: round(summary[key] * 1000, 3) for key in ('p50', 'p99', 'max')}
+        if batch_size is not None:
+            summary = batch_size.summary()
+            result['batch_size'] = {'mean': round(summary['mean'], 2), 'p50': summary['p50'],
+                                    'max': int(summary['max'])}
+        return result
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The socketserver default backlog of 5 resets connections under bursts
+    request_queue_size = 256
+
+
+def make_handler(batcher, cache=None, timeout=5.0):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            elif self.path == '/metrics':
+                body = batcher.metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif self.path == '/stats':
+                stats = batcher.stats()
+                if cache is not None:
+                    stats['cache'] = cache.stats()
+                self._send_json(200, stats)
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send_json(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                record = {field: float(payload[field]) for field in INPUT_FIELDS}
+            except KeyError as e:
+                self._send_json(400, {'error': f"missing field: {e.args[0]}"})
+                return
+            except (ValueError, TypeError) as e:
+                self._send_json(400, {'error': f"invalid request: {e}"})
+                return
+            failed = failed_rules(record)
+            if failed:
+                self._send_json(400, {'error': 'implausible input', 'failed_rules': failed,
+                                      'details': [describe_rule(name) for name in failed]})
+                return
+
+            key = make_key(record[field] for field in INPUT_FIELDS)
+            result = cache.get(key) if cache is not None else None
+            if result is None:
+                try:
+                    result = batcher.predict(record, timeout)
+                except Exception as e:
+                    self._send_json(500, {'error': str(e)})
+                    return
+                if cache is not None:
+                    cache.put(key, result)
+            label, probability, bits = result
+            self._send_json(200, {'prediction': label, 'probability': probability,
+                                  'recommendations': list(names(bits))})
+
+        def log_message(self, format, *args):
+            # Per-request access logs would dominate the cost of a prediction
+            pass
+
+    return PredictionHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP prediction service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--model', default='model.pkl', help="Pickled model path")
+    parser.add_argument('--max-batch', type=int, default=64, help="Largest micro-batch")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="How long the first request of a batch waits for others")
+    parser.add_argument('--cache-size', type=int, default=10_000,
+                        help="Cached input profiles (0 disables the cache)")
+    parser.add_argument('--cache-ttl', type=float, default=3600.0, help="Cache entry lifetime (s)")
+    args = parser.parse_args(argv)
+
+    with open(args.model, 'rb') as file:
+        model = pickle.load(file)
+
+    # Micro-batches are small, where the compiled evaluator beats sklearn
+    batcher = MicroBatcher(compile_model(model), args.max_batch, args.max_wait_ms)
+    cache = PredictionCache(args.cache_size, args.cache_ttl) if args.cache_size > 0 else None
+    server = PredictionServer((args.host, args.port), make_handler(batcher, cache))
+    print(f"Serving predictions on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Batch scoring must write one row per input row, leaving rejected rows unscored."""
+
+import io
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from batch_score import score_chunks, score_file
+from compiled_model import compile_model
+from inference import FEATURE_COLUMNS, build_feature_frame
+from train import build_model
+from validation import RULES, failed_rules_column, validate_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+class ScoreChunksTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The first rows of cardio_train.csv include ones that break a rule
+        cls.df = pd.read_csv(RAW_DATA, sep=';', nrows=600)
+        cls.model = build_model(n_estimators=5, n_jobs=1, random_state=0, oob_score=False,
+                                max_depth=6)
+        cls.model.fit(build_feature_frame(cls.df), cls.df['cardio'])
+        cls.valid = validate_frame(cls.df)
+        assert not cls.valid.all()
+
+    def _chunks(self, size=100):
+        return (self.df.iloc[begin:begin + size] for begin in range(0, len(self.df), size))
+
+    def test_rejected_rows_keep_their_place_unscored(self):
+        counts = dict.fromkeys(RULES, 0)
+        result = pd.concat(score_chunks(self.model, self._chunks(), counts))
+        self.assertEqual(list(result['id']), list(self.df['id']))
+        self.assertEqual(str(result['prediction'].dtype), 'Int64')
+        np.testing.assert_array_equal(result['prediction'].isna().to_numpy(), ~self.valid)
+        np.testing.assert_array_equal(result['probability'].isna().to_numpy(), ~self.valid)
+        np.testing.assert_array_equal(result['failed_rules'].to_numpy(), failed_rules_column(self.df))
+        expected_counts = dict.fromkeys(RULES, 0)
+        validate_frame(self.df, expected_counts)
+        self.assertEqual(counts, expected_counts)
+
+        expected = self.model.predict_proba(build_feature_frame(self.df[self.valid]))[:, 1]
+        np.testing.assert_allclose(result['probability'].to_numpy()[self.valid], expected)
+        # Recommendations apply to every row, scored or not
+        self.assertFalse(result['recommendations'].isna().any())
+
+    def test_fully_rejected_chunk_still_yields_its_rows(self):
+        invalid = self.df[~self.valid]
+        results = list(score_chunks(self.model, [invalid, self.df[self.valid]], {}))
+        self.assertEqual([len(result) for result in results], [len(invalid), int(self.valid.sum())])
+        self.assertEqual(list(results[0].columns), list(results[1].columns))
+        self.assertTrue(results[0]['prediction'].isna().all())
+
+    def test_without_validation_every_row_is_scored(self):
+        result = pd.concat(score_chunks(self.model, self._chunks()))
+        self.assertEqual(len(result), len(self.df))
+        self.assertFalse(result['prediction'].isna().any())
+        self.assertNotIn('failed_rules', result)
+
+    def test_contributions_add_up_to_the_probability(self):
+        result = pd.concat(score_chunks(compile_model(self.model), self._chunks(), {},
+                                        contributions=True))
+        columns = [f'contribution_{column}' for column in FEATURE_COLUMNS]
+        scored = result[self.valid]
+        self.assertTrue(result.loc[~self.valid, columns].isna().all().all())
+        bias = scored['probability'] - scored[columns].sum(axis=1)
+        np.testing.assert_allclose(bias, bias.iloc[0], atol=1e-9)
+
+    def test_header_is_written_when_the_first_chunk_is_rejected(self):
+        source = io.StringIO()
+        pd.concat([self.df[~self.valid], self.df[self.valid]]).to_csv(source, sep=';', index=False)
+        source.seek(0)
+        output = io.StringIO()
+        rows = score_file(self.model, source, output, chunk_size=int((~self.valid).sum()),
+                          rule_counts={})
+        output.seek(0)
+        written = pd.read_csv(output)
+        self.assertEqual(rows, len(self.df))
+        self.assertEqual(len(written), len(self.df))
+        self.assertEqual(list(written.columns[:3]), ['id', 'prediction', 'probability'])
+
+
+if __name__ == '__main__':
+    unittest.main()
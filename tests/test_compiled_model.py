@@ -0,0 +1,95 @@
+"""The compiled evaluator must score exactly like the pickled ensemble it was built from."""
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from compiled_model import PRECISIONS, compile_model, export_model, load_compiled
+from inference import FeatureEncoder, build_feature_frame
+from train import build_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+TRAINED_MODEL = os.path.join(ROOT, 'model.pkl')
+# Largest probability error per stored precision: float32 values round at
+# ~1e-7, integer levels at half a step
+TOLERANCE = {'float64': 0.0, 'float32': 1e-6, 'uint16': 0.5 / 65535, 'uint8': 0.5 / 255}
+
+
+def _fit(rows, **tree_params):
+    df = pd.read_csv(RAW_DATA, sep=';', nrows=rows)
+    model = build_model(n_estimators=10, n_jobs=1, random_state=0, oob_score=False, **tree_params)
+    model.fit(build_feature_frame(df), df['cardio'])
+    model.n_jobs = None
+    # Round-trip through pickle, as the app loads it
+    model = pickle.loads(pickle.dumps(model))
+    encoder = FeatureEncoder(model)
+    return model, encoder.model, encoder.encode_frame(df)
+
+
+class CompiledEnsembleTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The app's default unpruned trees and a depth-limited ensemble
+        cls.unpruned, cls.unpruned_arrays, cls.X = _fit(4000)
+        cls.pruned, cls.pruned_arrays, _ = _fit(4000, max_depth=6)
+
+    def test_float64_is_bit_identical(self):
+        for reference in (self.unpruned_arrays, self.pruned_arrays):
+            compiled = compile_model(reference)
+            np.testing.assert_array_equal(compiled.predict_proba(self.X), reference.predict_proba(self.X))
+            np.testing.assert_array_equal(compiled.predict(self.X), reference.predict(self.X))
+
+    def test_export_round_trip_is_bit_identical(self):
+        with tempfile.TemporaryDirectory() as path:
+            export_model(self.unpruned, path)
+            for mmap in (True, False):
+                compiled = load_compiled(path, mmap=mmap)
+                np.testing.assert_array_equal(compiled.predict_proba(self.X),
+                                              self.unpruned_arrays.predict_proba(self.X))
+
+    def test_reduced_precision_within_tolerance(self):
+        for model, reference in ((self.unpruned, self.unpruned_arrays), (self.pruned, self.pruned_arrays)):
+            expected = reference.predict_proba(self.X)
+            labels = reference.predict(self.X)
+            for precision in PRECISIONS:
+                with self.subTest(precision=precision, max_depth=model.estimator.max_depth), \
+                        tempfile.TemporaryDirectory() as path:
+                    export_model(model, path, precision)
+                    compiled = load_compiled(path)
+                    proba = compiled.predict_proba(self.X)
+                    self.assertLessEqual(np.abs(proba - expected).max(), TOLERANCE[precision])
+                    # uint8 steps of 1/255 can move a probability across 0.5
+                    if precision != 'uint8':
+                        np.testing.assert_array_equal(compiled.predict(self.X), labels)
+
+    @unittest.skipUnless(os.path.isfile(TRAINED_MODEL), "no trained model.pkl")
+    def test_trained_model_is_bit_identical_at_every_precision(self):
+        # The trained model's leaf values survive every precision exactly
+        with open(TRAINED_MODEL, 'rb') as file:
+            model = pickle.load(file)
+        encoder = FeatureEncoder(model)
+        X = encoder.encode_frame(pd.read_csv(RAW_DATA, sep=';'))
+        expected = encoder.model.predict_proba(X)
+        for precision in PRECISIONS:
+            with self.subTest(precision=precision):
+                np.testing.assert_array_equal(compile_model(model, precision).predict_proba(X), expected)
+
+    def test_explain_matches_predict_proba_and_contributions(self):
+        compiled = compile_model(self.pruned)
+        proba, bias, contributions = compiled.explain(self.X)
+        np.testing.assert_array_equal(proba, compiled.predict_proba(self.X))
+        expected_bias, expected_contributions = compiled.contributions(self.X)
+        self.assertEqual(bias, expected_bias)
+        np.testing.assert_array_equal(contributions, expected_contributions)
+        np.testing.assert_allclose(bias + contributions.sum(axis=1),
+                                   proba[:, compiled.positive_index], atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""The binary cache must give back the frame pandas parses, and notice source changes."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dataset import load_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+class LoadDatasetTest(unittest.TestCase):
+
+    def _assert_same(self, df, expected):
+        # Values only: cached integers are downcast, and mapped columns are memmaps
+        self.assertEqual(list(df.columns), list(expected.columns))
+        for column in expected:
+            np.testing.assert_array_equal(np.asarray(df[column]), expected[column].to_numpy(),
+                                          err_msg=column)
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp, 'cache')
+        self.path = os.path.join(self.tmp, 'cardio.csv')
+        pd.read_csv(RAW_DATA, sep=';', nrows=1000).to_csv(self.path, sep=';', index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_cached_frame_equals_the_parsed_file(self):
+        expected = pd.read_csv(self.path, sep=';')
+        for mmap in (False, True):
+            # The first call builds the cache, the later ones read it
+            df = load_dataset(self.path, self.cache_dir, mmap=mmap)
+            self._assert_same(df, expected)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_text_columns_round_trip(self):
+        path = os.path.join(self.tmp, 'labels.csv')
+        pd.DataFrame({'group': ['Senior', 'Young', 'Senior', ''], 'n': [1, 2, 3, 4]}).to_csv(path, index=False)
+        load_dataset(path, self.cache_dir)
+        df = load_dataset(path, self.cache_dir)
+        self.assertEqual(df['group'].astype(object).fillna('').tolist(),
+                         pd.read_csv(path, keep_default_na=False)['group'].tolist())
+
+    def test_changed_source_rebuilds_the_cache(self):
+        load_dataset(self.path, self.cache_dir)
+        df = pd.read_csv(self.path, sep=';')
+        df.loc[0, 'weight'] = 123.5
+        df.to_csv(self.path, sep=';', index=False)
+        self._assert_same(load_dataset(self.path, self.cache_dir), df)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
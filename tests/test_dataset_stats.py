@@ -0,0 +1,59 @@
+"""One-pass statistics must equal what pandas computes over all the rows."""
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from dataset_stats import DatasetStats, refresh_stats
+from inference import build_feature_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+class DatasetStatsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        raw = pd.read_csv(RAW_DATA, sep=';', nrows=3000)
+        # Integer ages and a float BMI, as in the preprocessed file
+        cls.df = build_feature_frame(raw).drop(columns=['Unnamed: 0']).assign(cardio=raw['cardio'])
+
+    def _assert_matches_pandas(self, stats, df):
+        self.assertEqual(stats.rows, len(df))
+        pd.testing.assert_series_equal(stats.class_counts(), df['cardio'].value_counts().sort_index(),
+                                       check_dtype=False)
+        for column in ('cholesterol', 'age'):
+            pd.testing.assert_series_equal(stats.value_counts(column).sort_index(),
+                                           df[column].value_counts().sort_index(), check_dtype=False)
+            for q in (0.1, 0.5, 0.9):
+                self.assertEqual(stats.quantile(column, q), df[column].quantile(q))
+        self.assertAlmostEqual(stats.column_mean('bmi'), df['bmi'].mean(), places=9)
+        pd.testing.assert_frame_equal(stats.correlation(), df.corr(numeric_only=True), atol=1e-9)
+
+    def test_chunked_summary_matches_pandas(self):
+        self._assert_matches_pandas(DatasetStats.from_frame(self.df, chunk_size=700), self.df)
+
+    def test_merged_halves_equal_the_whole(self):
+        first = DatasetStats.from_frame(self.df.iloc[:1234])
+        first.merge(DatasetStats.from_frame(self.df.iloc[1234:]))
+        self._assert_matches_pandas(first, self.df)
+
+    def test_refresh_follows_appends_and_rewrites(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data.csv')
+            stats_dir = os.path.join(tmp, 'stats')
+            self.df.iloc[:2000].to_csv(path)
+            self._assert_matches_pandas(refresh_stats(path, stats_dir), self.df.iloc[:2000])
+            with open(path, 'a', newline='') as file:
+                self.df.iloc[2000:].to_csv(file, header=False)
+            self._assert_matches_pandas(refresh_stats(path, stats_dir), self.df)
+            # A rewritten file is summarized from scratch
+            self.df.iloc[::2].to_csv(path)
+            self._assert_matches_pandas(refresh_stats(path, stats_dir), self.df.iloc[::2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""FeatureEncoder must feed the model what build_feature_frame does, without touching it."""
+
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from inference import INPUT_FIELDS, FeatureEncoder, build_feature_frame
+from train import build_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+class FeatureEncoderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(RAW_DATA, sep=';', nrows=2000)
+        cls.model = build_model(n_estimators=5, n_jobs=1, random_state=0, oob_score=False,
+                                max_depth=6)
+        cls.model.fit(build_feature_frame(cls.df), cls.df['cardio'])
+        cls.encoder = FeatureEncoder(cls.model)
+
+    def test_leaves_the_model_untouched(self):
+        self.assertIsNot(self.encoder.model, self.model)
+        self.assertTrue(hasattr(self.model, 'feature_names_in_'))
+        self.assertFalse(hasattr(self.encoder.model, 'feature_names_in_'))
+        # The caller's model still checks the columns of frames it is given
+        with self.assertRaises(ValueError):
+            self.model.predict_proba(build_feature_frame(self.df).iloc[:, ::-1])
+
+    def test_encoded_rows_score_like_feature_frames(self):
+        expected = self.model.predict_proba(build_feature_frame(self.df))
+        np.testing.assert_array_equal(
+            self.encoder.model.predict_proba(self.encoder.encode_frame(self.df)), expected)
+        for i in (0, 1, 999):
+            row = self.df.loc[i, INPUT_FIELDS].tolist()
+            np.testing.assert_array_equal(
+                self.encoder.model.predict_proba(self.encoder.encode_one(*row)), expected[i:i + 1])
+
+    def test_rejects_a_model_trained_on_other_columns(self):
+        model = build_model(n_estimators=2, n_jobs=1, random_state=0, oob_score=False, max_depth=2)
+        features = build_feature_frame(self.df).rename(columns={'bmi': 'body_mass_index'})
+        model.fit(features, self.df['cardio'])
+        with self.assertRaises(ValueError):
+            FeatureEncoder(model)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""The risk table must answer exactly as the live model it was built from."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from compiled_model import compile_model
+from inference import FeatureEncoder, build_feature_frame
+from lookup_table import DOMAIN, RiskTable, build_table, load_table, verify_table
+from train import build_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+def _fit(max_depth, random_state=0):
+    df = pd.read_csv(RAW_DATA, sep=';', nrows=4000)
+    model = build_model(n_estimators=5, n_jobs=1, random_state=random_state, oob_score=False,
+                        max_depth=max_depth)
+    model.fit(build_feature_frame(df), df['cardio'])
+    return compile_model(model)
+
+
+class RiskTableTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.model = _fit(max_depth=3)
+        build_table(cls.model, cls.tmp.name)
+        cls.table = load_table(cls.tmp.name, cls.model)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_matches_the_live_model(self):
+        result = verify_table(self.table, self.model, samples=20_000)
+        self.assertEqual(result['label_mismatches'], 0)
+        # Probabilities are stored as float32
+        self.assertLessEqual(result['max_probability_error'], 1e-7)
+
+    def test_matches_the_app_encoding_at_the_domain_edges(self):
+        # Every combination of each input's bounds, scored as the app scores a form
+        bounds = np.array(list(DOMAIN.values()))
+        corners = np.array(np.meshgrid(*bounds, indexing='ij')).reshape(len(DOMAIN), -1).T
+        encoder = FeatureEncoder(self.model)
+        proba = self.model.predict_proba(encoder.encode_rows(corners))
+        labels, probability = self.table.predict(*corners.T)
+        np.testing.assert_array_equal(labels, self.model.classes_.take(np.argmax(proba, axis=1)))
+        np.testing.assert_allclose(probability, proba[:, self.model.positive_index], atol=1e-7)
+
+    def test_rejects_inputs_outside_the_domain(self):
+        inputs = [low for low, high in DOMAIN.values()]
+        inputs[0] = DOMAIN['age'][1] + 1
+        with self.assertRaises(IndexError):
+            self.table.predict(*inputs)
+
+    def test_is_ignored_for_another_model(self):
+        self.assertIsInstance(self.table, RiskTable)
+        self.assertIsNone(load_table(self.tmp.name, _fit(max_depth=3, random_state=1)))
+
+    def test_over_budget_table_is_refused(self):
+        with tempfile.TemporaryDirectory() as path, self.assertRaises(ValueError):
+            build_table(self.model, path, max_cells=1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Registry versions must load as published, and the watcher must swap them in."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from compiled_model import compile_model
+from inference import build_feature_frame
+from model_registry import ModelWatcher, current_version, list_versions, publish, set_current
+from train import build_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+def _fit(df, random_state):
+    model = build_model(n_estimators=3, n_jobs=1, random_state=random_state, oob_score=False,
+                        max_depth=4)
+    return model.fit(build_feature_frame(df), df['cardio'])
+
+
+class ModelRegistryTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(RAW_DATA, sep=';', nrows=2000)
+        cls.models = [_fit(cls.df, random_state) for random_state in (0, 1)]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.registry = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_watcher_serves_and_swaps_the_current_version(self):
+        watcher = ModelWatcher(self.registry, poll_interval=3600)
+        try:
+            self.assertIsNone(watcher.current())
+            first = publish(self.models[0], self.registry, report={'test_accuracy': 0.7})
+            self.assertTrue(watcher.check())
+            self.assertEqual(watcher.current().version, first)
+            self.assertFalse(watcher.check())
+
+            second = publish(self.models[1], self.registry, activate=False)
+            self.assertFalse(watcher.check())
+            set_current(self.registry, second)
+            self.assertTrue(watcher.check())
+            loaded = watcher.current()
+            self.assertEqual(loaded.version, second)
+            features = build_feature_frame(self.df)
+            np.testing.assert_array_equal(
+                loaded.model.predict_proba(loaded.encoder.encode_frame(self.df)),
+                compile_model(self.models[1]).predict_proba(features.to_numpy(dtype=np.float32)))
+        finally:
+            watcher.stop()
+        versions = {metadata['version']: metadata for metadata in list_versions(self.registry)}
+        self.assertEqual(set(versions), {first, second})
+        self.assertEqual(versions[first]['report'], {'test_accuracy': 0.7})
+
+    def test_unknown_version_cannot_become_current(self):
+        version = publish(self.models[0], self.registry)
+        with self.assertRaises(ValueError):
+            set_current(self.registry, 'no-such-version')
+        self.assertEqual(current_version(self.registry), version)
+
+
+if __name__ == '__main__':
+    unittest.main()
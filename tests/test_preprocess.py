@@ -0,0 +1,82 @@
+"""preprocess.py must write the file the notebook's cells produce."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from preprocess import append_new_rows, preprocess_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+def notebook_preprocess(input_path, output_path):
+    # The cells of Prac01_Explore.ipynb, in order
+    df = pd.read_csv(input_path, sep=';')
+    df = df.drop('id', axis=1)
+    df = df.drop_duplicates()
+    df['age'] = df['age'].astype(int)
+    df = df.drop('gender', axis=1)
+    df = df.drop(df[(df['age'] < 18) | (df['age'] > 70)].index)
+    df['age_category'] = np.where((df['age'] >= 25) & (df['age'] <= 30), 'Young',
+                         np.where((df['age'] >= 31) & (df['age'] <= 50), 'Middle_age',
+                         np.where((df['age'] >= 51) & (df['age'] <= 70), 'Senior', '')))
+    df['bmi'] = df['weight'] * 10000 / df['height'] / df['height']
+    df.to_csv(output_path)
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+class PreprocessTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        df = pd.read_csv(RAW_DATA, sep=';', nrows=2000)
+        # Repeat rows under new ids, later in the file and in other chunks
+        duplicates = df.iloc[[3, 10, 500, 1500]].copy()
+        duplicates['id'] += 10 ** 6
+        df = pd.concat([df, duplicates], ignore_index=True)
+        # Ages either side of the 18-70 bounds, including ones that truncate into range
+        df.loc[[7, 250, 1200, 1800, 1900], 'age'] = [12.5, 17.9, 70.9, 71.0, 18.0]
+        cls.raw_path = os.path.join(cls.tmp.name, 'raw.csv')
+        df.to_csv(cls.raw_path, sep=';', index=False)
+        cls.expected_path = os.path.join(cls.tmp.name, 'expected.csv')
+        notebook_preprocess(cls.raw_path, cls.expected_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_matches_notebook_across_chunk_sizes(self):
+        for chunk_size in (100, 999, 10 ** 6):
+            with self.subTest(chunk_size=chunk_size):
+                output_path = os.path.join(self.tmp.name, f'out_{chunk_size}.csv')
+                counts = preprocess_file(self.raw_path, output_path, chunk_size=chunk_size)
+                self.assertEqual(_read(output_path), _read(self.expected_path))
+                self.assertEqual(counts['rows_in'], 2004)
+                self.assertEqual(counts['duplicates'], 4)
+                self.assertEqual(counts['age_out_of_range'], 3)
+
+    def test_append_matches_full_run(self):
+        lines = _read(self.raw_path).splitlines(keepends=True)
+        partial_path = os.path.join(self.tmp.name, 'partial.csv')
+        with open(partial_path, 'wb') as file:
+            file.writelines(lines[:1201])
+        output_path = os.path.join(self.tmp.name, 'appended.csv')
+        state_dir = os.path.join(self.tmp.name, 'state')
+        preprocess_file(partial_path, output_path, chunk_size=500, state_dir=state_dir)
+        with open(partial_path, 'ab') as file:
+            file.writelines(lines[1201:])
+        append_new_rows(partial_path, output_path, state_dir=state_dir, chunk_size=500)
+        self.assertEqual(_read(output_path), _read(self.expected_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""The rule table must give the advice the app's original if-chain gave."""
+
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from recommendations import RULE_NAMES, messages, names, names_column, recommend, recommend_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+def app_recommendations(age, height, weight, ap_hi, ap_lo, cholesterol, gluc, smoke, active):
+    # The checks app.py made before the rule table, on the form's whole-year age
+    bmi = weight / ((height / 100) ** 2)
+    recommendations = []
+    if age > 50:
+        recommendations.append("**Age Factor:** Regular check-ups are important at your age.")
+    if bmi >= 25:
+        recommendations.append("**Weight:** Consider maintaining a healthy BMI through diet and exercise.")
+    if ap_hi > 140 or ap_lo > 90:
+        recommendations.append("**Blood Pressure:** Your BP is elevated. Consult a healthcare professional.")
+    if cholesterol >= 2:
+        recommendations.append("**Cholesterol:** High cholesterol levels. Discuss with your doctor about diet and medication.")
+    if gluc >= 2:
+        recommendations.append("**Glucose:** High glucose levels. Regular monitoring is recommended.")
+    if smoke == 1:
+        recommendations.append("**Smoking:** Consider quitting smoking to reduce cardiovascular risk.")
+    if active == 0:
+        recommendations.append("**Exercise:** Increase physical activity. Aim for 150 minutes of moderate activity per week.")
+    return tuple(recommendations)
+
+
+class RecommendationsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(RAW_DATA, sep=';', nrows=5000)
+
+    def test_matches_the_app_checks(self):
+        bits = recommend_frame(self.df)
+        for i, record in enumerate(self.df.to_dict('records')):
+            expected = app_recommendations(int(record['age']), record['height'], record['weight'],
+                                           record['ap_hi'], record['ap_lo'], record['cholesterol'],
+                                           record['gluc'], record['smoke'], record['active'])
+            self.assertEqual(messages(recommend(record)), expected)
+            self.assertEqual(int(bits[i]), recommend(record))
+
+    def test_age_is_compared_in_whole_years(self):
+        record = dict(self.df.iloc[0], age=50.9)
+        frame = pd.DataFrame([record, dict(record, age=51.0)])
+        self.assertNotIn('age', names(recommend(record)))
+        self.assertEqual([('age' in names(bits)) for bits in recommend_frame(frame)], [False, True])
+
+    def test_bmi_boundary(self):
+        # 72.25 kg at 170 cm is a BMI of exactly 25
+        frame = pd.DataFrame({'age': [40, 40], 'height': [170, 170], 'weight': [72.25, 72.0],
+                              'ap_hi': [120] * 2, 'ap_lo': [80] * 2, 'cholesterol': [1] * 2,
+                              'gluc': [1] * 2, 'smoke': [0] * 2, 'active': [1] * 2})
+        self.assertEqual([names(bits) for bits in recommend_frame(frame)], [('weight',), ()])
+
+    def test_names_column_decodes_bitsets(self):
+        bits = np.array([0, 1, 0b1000001, 1], dtype=np.uint8)
+        self.assertEqual(list(names_column(bits)),
+                         ['', RULE_NAMES[0], f'{RULE_NAMES[0]}|{RULE_NAMES[6]}', RULE_NAMES[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
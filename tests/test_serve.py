@@ -0,0 +1,83 @@
+"""The HTTP service must answer like the model, batch concurrent requests and reject bad input."""
+
+import json
+import os
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from inference import INPUT_FIELDS, FeatureEncoder, build_feature_frame
+from prediction_cache import PredictionCache
+from recommendations import names, recommend
+from serve import MicroBatcher, PredictionServer, make_handler
+from train import build_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DATA = os.path.join(ROOT, 'cardio_train.csv')
+
+
+class PredictionServiceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        df = pd.read_csv(RAW_DATA, sep=';', nrows=2000)
+        cls.model = build_model(n_estimators=5, n_jobs=1, random_state=0, oob_score=False,
+                                max_depth=6)
+        cls.model.fit(build_feature_frame(df), df['cardio'])
+        cls.records = df[INPUT_FIELDS].iloc[:64].to_dict('records')
+        cls.batcher = MicroBatcher(cls.model, max_wait_ms=20.0)
+        cls.server = PredictionServer(('127.0.0.1', 0), make_handler(cls.batcher, PredictionCache()))
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _post(self, payload):
+        request = urllib.request.Request(f'{self.url}/predict', data=json.dumps(payload).encode())
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def test_concurrent_requests_match_the_model(self):
+        encoder = FeatureEncoder(self.model)
+        proba = encoder.model.predict_proba(encoder.encode_frame(pd.DataFrame(self.records)))
+        batches = self.batcher.stats()['batches']
+        with ThreadPoolExecutor(16) as pool:
+            responses = list(pool.map(self._post, self.records))
+        for record, (status, body), expected in zip(self.records, responses, proba):
+            self.assertEqual(status, 200)
+            self.assertEqual(body['prediction'], int(np.argmax(expected)))
+            self.assertAlmostEqual(body['probability'], expected[1], places=12)
+            self.assertEqual(body['recommendations'], list(names(recommend(record))))
+        # Some requests shared a model call
+        self.assertLess(self.batcher.stats()['batches'] - batches, len(self.records))
+
+    def test_implausible_input_is_rejected(self):
+        status, body = self._post(dict(self.records[0], ap_hi=70, ap_lo=90))
+        self.assertEqual(status, 400)
+        self.assertEqual(body['failed_rules'], ['ap_hi_above_ap_lo'])
+
+    def test_age_is_checked_in_whole_years(self):
+        status, _ = self._post(dict(self.records[0], age=17.9))
+        self.assertEqual(status, 400)
+        status, _ = self._post(dict(self.records[0], age=100.5))
+        self.assertEqual(status, 200)
+
+    def test_missing_field_is_a_bad_request(self):
+        record = dict(self.records[0])
+        del record['gluc']
+        self.assertEqual(self._post(record), (400, {'error': 'missing field: gluc'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
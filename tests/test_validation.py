@@ -0,0 +1,64 @@
+"""The data-quality rules must reject the same rows whichever entry point checks them."""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from validation import RANGES, RULES, describe_rule, failed_rules, failed_rules_column, validate_frame
+
+VALID = {'age': 50.3, 'height': 170, 'weight': 70.0, 'ap_hi': 120, 'ap_lo': 80,
+         'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1}
+
+
+def _frame(*changes):
+    return pd.DataFrame([dict(VALID, **change) for change in changes])
+
+
+class ValidationTest(unittest.TestCase):
+
+    def test_each_rule_rejects_its_rows(self):
+        df = _frame({}, {'height': 99}, {'weight': 201.0}, {'ap_hi': 16020},
+                    {'ap_hi': 80, 'ap_lo': 120}, {'ap_lo': np.nan})
+        counts = {}
+        valid = validate_frame(df, counts)
+        np.testing.assert_array_equal(valid, [True, False, False, False, False, False])
+        self.assertEqual(counts['height_range'], 1)
+        self.assertEqual(counts['weight_range'], 1)
+        self.assertEqual(counts['ap_hi_range'], 1)
+        # 80 over 120 breaks the relation; a missing ap_lo breaks its range and the relation
+        self.assertEqual(counts['ap_hi_above_ap_lo'], 2)
+        self.assertEqual(counts['ap_lo_range'], 1)
+        self.assertEqual(set(counts), set(RULES))
+
+    def test_age_is_checked_in_whole_years(self):
+        low, high = RANGES['age']
+        ages = [low - 0.1, low, high + 0.9, high + 1]
+        valid = validate_frame(_frame(*({'age': age} for age in ages)))
+        np.testing.assert_array_equal(valid, [False, True, True, False])
+        self.assertEqual([failed_rules(dict(VALID, age=age)) for age in ages],
+                         [['age_range'], [], [], ['age_range']])
+
+    def test_failed_rules_column_names_every_broken_rule(self):
+        changes = [{}, {'height': 99}, {'ap_hi': 30, 'ap_lo': 40}, {'age': 10, 'smoke': 2}]
+        df = _frame(*changes)
+        column = failed_rules_column(df)
+        self.assertEqual(list(column), ['', 'height_range', 'ap_hi_range|ap_hi_above_ap_lo',
+                                        'age_range|smoke_range'])
+        for value, change in zip(column, changes):
+            self.assertEqual(value.split('|') if value else [], failed_rules(dict(VALID, **change)))
+        np.testing.assert_array_equal(column == '', validate_frame(df))
+
+    def test_rules_on_missing_columns_are_skipped(self):
+        df = _frame({'height': 99}).drop(columns=['height'])
+        counts = {}
+        self.assertTrue(validate_frame(df, counts).all())
+        self.assertNotIn('height_range', counts)
+
+    def test_describe_rule(self):
+        self.assertEqual(describe_rule('ap_hi_above_ap_lo'), "ap_hi must be > ap_lo")
+        self.assertEqual(describe_rule('height_range'), "height must be between 100 and 250")
+
+
+if __name__ == '__main__':
+    unittest.main()
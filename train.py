@@ -0,0 +1,262 @@
+"""Train the bagging model from the preprocessed dataset.
+
+Scripted version of Prac02_Model_train.ipynb. The trees of the ensemble are
+fitted in parallel across all cores, and accuracy is estimated from the
+out-of-bag samples of each bootstrap, so no separate evaluation pass over a
+held-out split is needed (one can still be requested with --test-size).
+
+Writes the pickled model, its pickle-free export and a JSON report with
+timings and accuracy, and can publish the model as a new registry version
+that running apps pick up without a restart (see model_registry.py).
+
+``--incremental`` refreshes the previous model after new rows were appended
+to the dataset (``preprocess.py --append``): only the oldest ``--replace``
+trees are refitted and ``--add`` trees are added, instead of refitting the
+whole ensemble. Accuracy is measured on a held-out share of the new rows,
+and ``--compare-full`` also times a full retrain on the same data.
+
+Usage:
+    python train.py --n-estimators 200
+    python train.py --n-estimators 200 --registry model_registry
+    python train.py --incremental --replace 20 --compare-full
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import BaggingClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+from compiled_model import PRECISIONS, export_model
+from dataset import file_sha256, load_dataset
+from inference import FEATURE_COLUMNS
+from model_registry import publish
+
+TARGET = 'cardio'
+# Below this many trees the out-of-bag estimate is unreliable: each row's OOB
+# vote comes from only about a third of the trees, and some rows are in
+# every bootstrap sample and get no vote at all
+MIN_OOB_ESTIMATORS = 25
+
+
+def load_training_data(path):
+    """Load the preprocessed dataset as (X, y) in the app's feature order."""
+    df = load_dataset(path)
+    df = df.drop('age_category', axis=1)
+    df['bmi'] = df['weight'] * 10000 / df['height'] / df['height']
+    return df[FEATURE_COLUMNS], df[TARGET]
+
+
+def build_model(n_estimators=10, n_jobs=-1, random_state=None, oob_score=True,
+                max_depth=None, min_samples_leaf=1, max_samples=1.0):
+    """The notebook's ensemble; the defaults grow unpruned trees on full-size bootstraps."""
+    base_model = DecisionTreeClassifier(max_depth=max_depth, min_samples_leaf=min_samples_leaf)
+    return BaggingClassifier(estimator=base_model, n_estimators=n_estimators,
+                             max_samples=max_samples, oob_score=oob_score, n_jobs=n_jobs,
+                             random_state=random_state)
+
+
+def train(X, y, n_estimators=10, n_jobs=-1, test_size=0.0, random_state=None, **tree_params):
+    """Fit the model and return it together with a report dict.
+
+    ``tree_params`` (max_depth, min_samples_leaf, max_samples) go to ``build_model``.
+    """
+    if test_size:
+        X, X_test, y, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    report = {'rows': len(X), 'features': list(X.columns), 'n_estimators': n_estimators,
+              'n_jobs': n_jobs, 'cpu_count': os.cpu_count(), **tree_params}
+
+    model = build_model(n_estimators, n_jobs, random_state, **tree_params)
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        # Rows without an OOB vote are left out of the score below instead
+        warnings.filterwarnings('ignore', message='Some inputs do not have OOB scores')
+        warnings.filterwarnings('ignore', message='invalid value encountered in divide')
+        model.fit(X, y)
+    report['fit_seconds'] = round(time.perf_counter() - start, 3)
+    # sklearn scores rows that got no OOB vote as the first class, which
+    # biases its oob_score_ low; score only the rows that have a vote
+    decision = model.oob_decision_function_
+    voted = ~np.isnan(decision).any(axis=1)
+    oob_labels = model.classes_.take(np.argmax(decision[voted], axis=1))
+    report['oob_accuracy'] = round(accuracy_score(np.asarray(y)[voted], oob_labels), 4)
+    report['oob_rows'] = int(voted.sum())
+    if n_estimators < MIN_OOB_ESTIMATORS and not test_size:
+        print(f"Warning: with {n_estimators} trees the OOB accuracy is a pessimistic estimate "
+              f"({len(X) - report['oob_rows']} rows had no OOB vote); use at least "
+              f"{MIN_OOB_ESTIMATORS} trees or pass --test-size for a held-out score", file=sys.stderr)
+    # The OOB decision matrix is only needed for the score above and is as
+    # large as the training set; don't ship it inside model.pkl
+    del model.oob_decision_function_
+
+    # Parallel prediction only adds dispatch overhead for the app's one-row
+    # calls and changes the order trees are summed in, so predict serially
+    model.n_jobs = None
+
+    if test_size:
+        start = time.perf_counter()
+        report['test_accuracy'] = round(accuracy_score(y_test, model.predict(X_test)), 4)
+        report['test_rows'] = len(X_test)
+        report['test_seconds'] = round(time.perf_counter() - start, 3)
+    return model, report
+
+
+def refresh_ensemble(model, X, y, n_replace=0, n_add=0, n_jobs=-1, random_state=None):
+    """Refit the ``n_replace`` oldest trees of ``model`` and add ``n_add`` new ones.
+
+    New trees draw their bootstrap samples from all of (X, y); the other
+    trees are kept unchanged. ``model`` is updated in place and returned.
+    """
+    if n_replace > len(model.estimators_):
+        raise ValueError(f"Cannot replace {n_replace} of {len(model.estimators_)} trees")
+    del model.estimators_[:n_replace]
+    del model.estimators_features_[:n_replace]
+    # A fresh random state, so the new trees don't reuse the seeds of the kept ones
+    model.set_params(warm_start=True, oob_score=False, n_jobs=n_jobs, random_state=random_state,
+                     n_estimators=len(model.estimators_) + n_replace + n_add)
+    model.fit(X, y)
+    model.set_params(warm_start=False, n_jobs=None)
+    return model
+
+
+def train_incremental(X, y, model, new_rows, n_replace, n_add=0, eval_fraction=0.2,
+                      compare_full=False, n_jobs=-1, random_state=None):
+    """Refresh ``model`` after the last ``new_rows`` rows of (X, y) were appended.
+
+    A random ``eval_fraction`` of the new rows is held out from every fit and
+    used to score the previous model, the refreshed one and (with
+    ``compare_full``) a full retrain of the same size.
+    """
+    rng = np.random.default_rng(random_state)
+    new_positions = np.arange(len(X) - new_rows, len(X))
+    held_out = np.zeros(len(X), dtype=bool)
+    held_out[rng.choice(new_positions, round(new_rows * eval_fraction), replace=False)] = True
+    X_train, y_train = X[~held_out], y[~held_out]
+    X_eval, y_eval = X[held_out], y[held_out]
+
+    report = {'rows': len(X_train), 'new_rows': new_rows, 'eval_rows': len(X_eval),
+              'n_replaced': n_replace, 'n_added': n_add, 'n_jobs': n_jobs,
+              'cpu_count': os.cpu_count()}
+    if len(X_eval):
+        report['previous_accuracy'] = round(accuracy_score(y_eval, model.predict(X_eval)), 4)
+
+    start = time.perf_counter()
+    refresh_ensemble(model, X_train, y_train, n_replace, n_add, n_jobs, random_state)
+    report['fit_seconds'] = round(time.perf_counter() - start, 3)
+    report['n_estimators'] = len(model.estimators_)
+    if len(X_eval):
+        report['test_accuracy'] = round(accuracy_score(y_eval, model.predict(X_eval)), 4)
+
+    if compare_full:
+        full_model = build_model(len(model.estimators_), n_jobs, random_state, oob_score=False)
+        start = time.perf_counter()
+        full_model.fit(X_train, y_train)
+        report['full_fit_seconds'] = round(time.perf_counter() - start, 3)
+        full_model.set_params(n_jobs=None)
+        if len(X_eval):
+            report['full_accuracy'] = round(accuracy_score(y_eval, full_model.predict(X_eval)), 4)
+    return model, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the cardiovascular risk model")
+    parser.add_argument('--data', default='Preprocessed_cardio_dataset.csv')
+    parser.add_argument('--n-estimators', type=int, default=10)
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Cores used for fitting (-1 = all)")
+    parser.add_argument('--test-size', type=float, default=0.0,
+                        help="Optional held-out fraction; accuracy otherwise comes from OOB samples")
+    parser.add_argument('--random-state', type=int, default=None)
+    parser.add_argument('--max-depth', type=int, default=None, help="Tree depth limit (default: none)")
+    parser.add_argument('--min-samples-leaf', type=int, default=1)
+    parser.add_argument('--max-samples', type=float, default=1.0,
+                        help="Bootstrap sample size as a share of the rows")
+    parser.add_argument('--model-out', default='model.pkl')
+    parser.add_argument('--compiled-out', default='model_compiled',
+                        help="Directory for the pickle-free export ('' to skip)")
+    parser.add_argument('--precision', choices=PRECISIONS, default='float64',
+                        help="Storage precision of the pickle-free export (see compiled_model.py)")
+    parser.add_argument('--report', default='model_report.json')
+    parser.add_argument('--registry', default='',
+                        help="Also publish to this model registry as the current version")
+    incremental = parser.add_argument_group("incremental training")
+    incremental.add_argument('--incremental', action='store_true',
+                             help="Refresh --model-out with the rows added since its report")
+    incremental.add_argument('--replace', type=int, default=0, help="Oldest trees to refit")
+    incremental.add_argument('--add', type=int, default=0, help="New trees to add")
+    incremental.add_argument('--eval-fraction', type=float, default=0.2,
+                             help="Share of the new rows held out for scoring")
+    incremental.add_argument('--compare-full', action='store_true',
+                             help="Also time and score a full retrain on the same rows")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    X, y = load_training_data(args.data)
+    load_seconds = time.perf_counter() - start
+
+    if args.incremental:
+        with open(args.report) as file:
+            previous = json.load(file)
+        if 'dataset_rows' not in previous:
+            parser.error(f"{args.report} has no dataset_rows; run a full training first")
+        with open(args.model_out, 'rb') as file:
+            model = pickle.load(file)
+        new_rows = len(X) - previous['dataset_rows']
+        model, report = train_incremental(X, y, model, new_rows, args.replace, args.add,
+                                          args.eval_fraction, args.compare_full, args.n_jobs,
+                                          args.random_state)
+        report['base_model_sha256'] = previous['model_sha256']
+    else:
+        model, report = train(X, y, args.n_estimators, args.n_jobs, args.test_size,
+                              args.random_state, max_depth=args.max_depth,
+                              min_samples_leaf=args.min_samples_leaf, max_samples=args.max_samples)
+    report['dataset_rows'] = len(X)
+    report['load_seconds'] = round(load_seconds, 3)
+
+    with open(args.model_out, 'wb') as file:
+        pickle.dump(model, file)
+    if args.compiled_out:
+        export_model(model, args.compiled_out, args.precision)
+
+    report.update({
+        'model_path': args.model_out,
+        'model_sha256': file_sha256(args.model_out),
+        'model_bytes': os.path.getsize(args.model_out),
+        'sklearn_version': sklearn.__version__,
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    })
+    with open(args.report, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    if args.incremental:
+        print(f"Refitted {args.replace} and added {args.add} trees on {report['rows']} rows "
+              f"({report['new_rows']} new) in {report['fit_seconds']}s")
+        if 'full_fit_seconds' in report:
+            print(f"Full retrain of {report['n_estimators']} trees: {report['full_fit_seconds']}s")
+        labels = {'previous_accuracy': 'Previous model', 'test_accuracy': 'Refreshed model',
+                  'full_accuracy': 'Full retrain'}
+        for key, label in labels.items():
+            if key in report:
+                print(f"{label} accuracy on {report['eval_rows']} held-out new rows: {report[key]:.2%}")
+    else:
+        print(f"Fitted {args.n_estimators} trees on {report['rows']} rows in {report['fit_seconds']}s "
+              f"(OOB accuracy {report['oob_accuracy']:.2%})")
+        if 'test_accuracy' in report:
+            print(f"Held-out accuracy: {report['test_accuracy']:.2%}")
+    print(f"Saved {args.model_out} and {args.report}")
+    if args.registry:
+        version = publish(model, args.registry, report, precision=args.precision)
+        print(f"Published version {version} to {args.registry}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Parallel hyperparameter search for the bagging ensemble.
+
+Evaluates a grid (or a random sample of it) of tree depth, minimum leaf
+size, bootstrap sample size and number of trees with k-fold cross-validation.
+Every (configuration, fold) fit is an independent job, spread across cores.
+Each configuration is scored on three objectives:
+
+- mean CV accuracy (higher is better)
+- single-row latency of the compiled evaluator the app uses (lower is better)
+- size of the compiled model (lower is better)
+
+Configurations that no other one matches or beats on all three form the
+Pareto front; pick one of them for production and train it with train.py.
+
+Usage:
+    python tune.py --folds 5 --output tune_report.json
+    python tune.py --n-iter 20 --n-jobs -1
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold
+
+from compiled_model import ARRAY_NAMES, compile_model
+from train import build_model, load_training_data
+
+PARAM_GRID = {
+    'max_depth': [None, 8, 12, 16],
+    'min_samples_leaf': [1, 5, 20],
+    'max_samples': [0.5, 1.0],
+    'n_estimators': [10, 25, 50],
+}
+LATENCY_ROWS = 300
+
+
+def evaluate_fold(params, X, y, train_index, test_index, random_state=None, keep_model=False):
+    """Fit one configuration on one fold; returns its scores (and compiled model)."""
+    model = build_model(n_jobs=1, random_state=random_state, oob_score=False, **params)
+    start = time.perf_counter()
+    model.fit(X[train_index], y[train_index])
+    fit_seconds = time.perf_counter() - start
+    compiled = compile_model(model)
+    result = {
+        'accuracy': accuracy_score(y[test_index], model.predict(X[test_index])),
+        'fit_seconds': fit_seconds,
+        'nodes': int(compiled.feature.size),
+        'model_bytes': sum(getattr(compiled, name).nbytes for name in ARRAY_NAMES),
+    }
+    return result, compiled if keep_model else None
+
+
+def measure_latency(model, X, n_rows=LATENCY_ROWS, repeats=3):
+    """Median and p99 milliseconds of one-row ``predict_proba`` calls.
+
+    The best of ``repeats`` passes is kept, which filters out passes slowed
+    down by unrelated activity on the machine.
+    """
+    # Untimed warm-up calls, so the first model measured isn't penalised
+    for row in X[:20]:
+        model.predict_proba(row[np.newaxis, :])
+    passes = []
+    for _ in range(repeats):
+        times = []
+        for row in X[:n_rows]:
+            features = row[np.newaxis, :]
+            start = time.perf_counter()
+            model.predict_proba(features)
+            times.append(time.perf_counter() - start)
+        ms = np.asarray(times) * 1000
+        passes.append((float(np.percentile(ms, 50)), float(np.percentile(ms, 99))))
+    return min(passes)
+
+
+def pareto_front(results):
+    """Indices of the results not dominated on (accuracy, latency, size)."""
+    points = np.array([(-r['accuracy'], r['latency_ms'], r['model_bytes']) for r in results])
+    front = []
+    for i, point in enumerate(points):
+        dominated = np.any(np.all(points <= point, axis=1) & np.any(points < point, axis=1))
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def search(X, y, candidates, folds=5, n_jobs=-2, random_state=None):
+    """Cross-validate every candidate; returns one result dict per candidate."""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=random_state).split(X, y))
+    jobs = [(c, f) for c in range(len(candidates)) for f in range(folds)]
+    # Results arrive in job order while later fits run; each candidate's
+    # fold-0 model is timed as it arrives and then dropped, so memory is
+    # bounded by the jobs in flight, not the grid. The default n_jobs leaves
+    # a core free, so the timing doesn't compete with the fits
+    outputs = Parallel(n_jobs=n_jobs, return_as='generator')(
+        delayed(evaluate_fold)(candidates[c], X, y, *splits[f], random_state, keep_model=f == 0)
+        for c, f in jobs)
+
+    results = []
+    scores = []
+    for (c, f), (fold_scores, compiled) in zip(jobs, outputs):
+        scores.append(fold_scores)
+        if compiled is not None:
+            latency_p50, latency_p99 = measure_latency(compiled, X[splits[0][1]])
+            del compiled
+        if f < folds - 1:
+            continue
+        accuracies = [s['accuracy'] for s in scores]
+        results.append({
+            'params': candidates[c],
+            'accuracy': round(float(np.mean(accuracies)), 4),
+            'accuracy_std': round(float(np.std(accuracies)), 4),
+            'latency_ms': round(latency_p50, 4),
+            'latency_p99_ms': round(latency_p99, 4),
+            'model_bytes': int(np.mean([s['model_bytes'] for s in scores])),
+            'nodes': int(np.mean([s['nodes'] for s in scores])),
+            'fit_seconds': round(float(np.mean([s['fit_seconds'] for s in scores])), 3),
+        })
+        scores = []
+    for i in pareto_front(results):
+        results[i]['pareto'] = True
+    return results
+
+
+def train_command(params):
+    """The train.py invocation that fits ``params`` on the full dataset.
+
+    Parameters a grid leaves out keep train.py's defaults, which are
+    ``build_model``'s, so they get no flag.
+    """
+    parts = ['python train.py']
+    for name in ('n_estimators', 'max_depth', 'min_samples_leaf', 'max_samples'):
+        if params.get(name) is not None:
+            parts.append(f"--{name.replace('_', '-')} {params[name]}")
+    return ' '.join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hyperparameter search for the tree ensemble")
+    parser.add_argument('--data', default='Preprocessed_cardio_dataset.csv')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--n-iter', type=int, default=0,
+                        help="Evaluate this many random configurations instead of the full grid")
+    parser.add_argument('--grid', help="JSON file with a parameter grid replacing the default")
+    parser.add_argument('--n-jobs', type=int, default=-2,
+                        help="Parallel fits (-1 = all cores, -2 = all but the one timing latency)")
+    parser.add_argument('--random-state', type=int, default=0)
+    parser.add_argument('--output', default='tune_report.json')
+    args = parser.parse_args(argv)
+
+    grid = PARAM_GRID
+    if args.grid:
+        with open(args.grid) as file:
+            grid = json.load(file)
+    if args.n_iter:
+        candidates = list(ParameterSampler(grid, args.n_iter, random_state=args.random_state))
+    else:
+        candidates = list(ParameterGrid(grid))
+
+    X, y = load_training_data(args.data)
+    print(f"Evaluating {len(candidates)} configurations x {args.folds} folds on {len(X)} rows "
+          f"({os.cpu_count()} cores)", file=sys.stderr)
+    start = time.perf_counter()
+    results = search(X, y, candidates, args.folds, args.n_jobs, args.random_state)
+    seconds = time.perf_counter() - start
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'rows': len(X),
+        'folds': args.folds,
+        'grid': grid,
+        'search_seconds': round(seconds, 1),
+        'results': sorted(results, key=lambda r: -r['accuracy']),
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(f"{'':2}{'accuracy':>10} {'latency ms':>11} {'size MB':>8}  params")
+    for result in report['results']:
+        marker = '*' if result.get('pareto') else ' '
+        print(f"{marker:2}{result['accuracy']:>10.2%} {result['latency_ms']:>11.3f} "
+              f"{result['model_bytes'] / 1e6:>8.2f}  {result['params']}")
+    print(f"\n* Pareto-optimal. Searched in {seconds:.0f}s; wrote {args.output}")
+    best = max((r for r in results if r.get('pareto')), key=lambda r: r['accuracy'])
+    print(f"Most accurate Pareto-optimal model: {train_command(best['params'])}")
+
+
+if __name__ == '__main__':
+    main()
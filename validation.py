@@ -0,0 +1,163 @@
+"""Declarative data-quality rules shared by preprocessing, scoring and the app.
+
+The raw dataset contains physiologically impossible records (blood
+pressures of 16020 mmHg, diastolic above systolic, ...). The rules below
+say what a plausible record looks like. They are applied as vectorized
+masks over whole chunks, with a rejection count per rule. Age is checked
+in whole years, as preprocessing and the model see it. The app's form
+bounds and the risk table's domain (lookup_table.py) come from the same
+ranges, so every layer agrees on what a valid input is.
+
+Usage:
+    from validation import validate_frame
+    counts = {}
+    valid = validate_frame(chunk, counts)   # boolean mask; counts per rule
+
+    python validation.py cardio_train.csv
+"""
+
+import argparse
+import operator
+import sys
+import time
+
+import numpy as np
+
+# Plausible range of every raw input, inclusive
+RANGES = {
+    'age': (18, 100),
+    'height': (100, 250),
+    'weight': (30, 200),
+    'ap_hi': (60, 250),
+    'ap_lo': (40, 150),
+    'cholesterol': (0, 3),
+    'gluc': (0, 3),
+    'smoke': (0, 1),
+    'alco': (0, 1),
+    'active': (0, 1),
+}
+# Relations between columns: rule name -> (column, operator, other column)
+RELATIONS = {
+    'ap_hi_above_ap_lo': ('ap_hi', '>', 'ap_lo'),
+}
+# Inputs truncated to whole numbers before the model sees them (age in
+# years); their ranges apply to the truncated value
+TRUNCATED = {'age'}
+# Ages the notebook keeps when preprocessing the training data. Narrower
+# than the plausible range on purpose: scoring still accepts older users
+TRAINING_AGES = (18, 70)
+OPERATORS = {'>': (np.greater, operator.gt), '>=': (np.greater_equal, operator.ge)}
+
+RULES = [f'{column}_range' for column in RANGES] + list(RELATIONS)
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+def validate_frame(df, counts=None):
+    """Boolean mask of the rows of ``df`` that pass every rule.
+
+    Rules whose columns are missing from ``df`` are skipped. ``counts``, if
+    given, is a dict updated with the rows each rule rejected; a row that
+    breaks several rules is counted under each of them. Missing values fail
+    their range rule.
+    """
+    n = len(df)
+    valid = np.ones(n, dtype=bool)
+    ok = np.empty(n, dtype=bool)
+    for name in _check_rules(df, ok):
+        valid &= ok
+        if counts is not None:
+            counts[name] = counts.get(name, 0) + n - int(np.count_nonzero(ok))
+    return valid
+
+
+def failed_rules_column(df, sep='|'):
+    """``sep``-joined names of the rules each row of ``df`` breaks ('' for valid rows).
+
+    Rows are reduced to a bitset of failed rules first, so each distinct
+    combination is spelled out once.
+    """
+    n = len(df)
+    bits = np.zeros(n, dtype=np.min_scalar_type((1 << len(RULES)) - 1))
+    ok = np.empty(n, dtype=bool)
+    for name in _check_rules(df, ok):
+        np.bitwise_or(bits, bits.dtype.type(1 << RULES.index(name)), out=bits, where=~ok)
+    distinct, inverse = np.unique(bits, return_inverse=True)
+    labels = np.array([sep.join(name for bit, name in enumerate(RULES) if value >> bit & 1)
+                       for value in distinct.tolist()], dtype=object)
+    return labels[inverse]
+
+
+def _check_rules(df, ok):
+    # Writes each applicable rule's pass mask into ``ok`` and yields the
+    # rule's name; comparisons write into preallocated masks, so a chunk
+    # costs a couple of passes over each column and no temporary arrays
+    scratch = np.empty(len(df), dtype=bool)
+    for column, (low, high) in RANGES.items():
+        if column not in df:
+            continue
+        values = df[column].to_numpy()
+        if column in TRUNCATED:
+            values = np.trunc(values)
+        np.greater_equal(values, low, out=ok)
+        np.less_equal(values, high, out=scratch)
+        ok &= scratch
+        yield f'{column}_range'
+    for name, (column, op, other) in RELATIONS.items():
+        if column not in df or other not in df:
+            continue
+        OPERATORS[op][0](df[column].to_numpy(), df[other].to_numpy(), out=ok)
+        yield name
+
+
+def failed_rules(record):
+    """Names of the rules a single record (a mapping of raw inputs) breaks."""
+    failed = [f'{column}_range' for column, (low, high) in RANGES.items()
+              if column in record and not low <= _value(record, column) <= high]
+    for name, (column, op, other) in RELATIONS.items():
+        if column in record and other in record \
+                and not OPERATORS[op][1](record[column], record[other]):
+            failed.append(name)
+    return failed
+
+
+def _value(record, column):
+    value = record[column]
+    return np.trunc(value) if column in TRUNCATED else value
+
+
+def describe_rule(name):
+    """Human-readable statement of a rule, for error messages."""
+    if name in RELATIONS:
+        column, op, other = RELATIONS[name]
+        return f"{column} must be {op} {other}"
+    column = name[:-len('_range')]
+    low, high = RANGES[column]
+    return f"{column} must be between {low} and {high}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report rule violations in a raw dataset")
+    parser.add_argument('input', nargs='?', default='cardio_train.csv')
+    parser.add_argument('--sep', default=';')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    import pandas as pd
+
+    counts = dict.fromkeys(RULES, 0)
+    rows = rejected = 0
+    validate_seconds = 0.0
+    for chunk in pd.read_csv(args.input, sep=args.sep, chunksize=args.chunk_size):
+        start = time.perf_counter()
+        valid = validate_frame(chunk, counts)
+        validate_seconds += time.perf_counter() - start
+        rows += len(chunk)
+        rejected += len(chunk) - int(np.count_nonzero(valid))
+
+    for name, count in counts.items():
+        print(f"{name:<20} {count:>10}  ({describe_rule(name)})")
+    rate = rows / max(validate_seconds, 1e-9)
+    print(f"{rejected} of {rows} rows rejected; rules checked at {rate:,.0f} rows/s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Process-pool worker tier for predictions.
+
+Each worker process loads the model once and keeps it; a request carries
+only the model's path and the raw inputs. Scoring runs outside the calling
+process, so threads waiting on a prediction (one per Streamlit session)
+don't compete for its GIL, and throughput scales with the number of
+workers. At most ``queue_depth`` requests are queued or running at a time;
+beyond that ``submit`` raises ``PoolBusy`` right away instead of letting
+latency grow without bound.
+
+When the model path changes (a new registry version), each worker drops
+its old model before loading the new one, so a worker never holds more
+than one model.
+
+Usage:
+    pool = PredictionPool(workers=4, queue_depth=64)
+    labels, probas = pool.predict('model_compiled', [(50, 170, 70, 120, 80, 1, 1, 0, 0, 1)])
+"""
+
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.context import SpawnContext, SpawnProcess
+
+from compiled_model import load_model_file
+from inference import FeatureEncoder, predict_with_contributions, predict_with_proba
+
+# Loaded model of this worker process: path -> (model, encoder)
+_worker_models = {}
+
+
+def _load(path):
+    entry = _worker_models.get(path)
+    if entry is None:
+        _worker_models.clear()
+        model = load_model_file(path)
+        entry = _worker_models[path] = (model, FeatureEncoder(model))
+    return entry
+
+
+def _warm(path):
+    # A failing initializer would break the whole pool; load errors are
+    # reported to the first request instead
+    if path is not None:
+        try:
+            _load(path)
+        except Exception:
+            pass
+
+
+def _score(path, rows, contributions=False):
+    model, encoder = _load(path)
+    if contributions:
+        return predict_with_contributions(model, encoder.encode_rows(rows))
+    return predict_with_proba(model, encoder.encode_rows(rows))
+
+
+class _WorkerProcess(SpawnProcess):
+    """Spawned process that doesn't re-run the parent's ``__main__`` script.
+
+    A spawned child normally re-executes ``__main__`` on start-up, and
+    Streamlit installs the app script as ``__main__``: every worker would
+    render the whole app once. The child only learns about ``__main__`` from
+    data collected while it is launched, so a bare module stands in for it
+    during the launch.
+    """
+
+    @staticmethod
+    def _Popen(process_obj):
+        main = sys.modules['__main__']
+        placeholder = sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            return SpawnProcess._Popen(process_obj)
+        finally:
+            # Unless a script run installed its own module in the meantime
+            if sys.modules['__main__'] is placeholder:
+                sys.modules['__main__'] = main
+
+
+class _WorkerContext(SpawnContext):
+    # Spawned rather than forked: the parent runs server threads, and a
+    # forked child could inherit a lock held by one of them
+    Process = _WorkerProcess
+
+
+class PoolBusy(RuntimeError):
+    """Every queue slot is taken; the caller should retry later."""
+
+
+class PredictionPool:
+    """Bounded queue in front of a pool of model-holding worker processes."""
+
+    def __init__(self, workers=None, queue_depth=64, model_path=None):
+        self.workers = workers or os.cpu_count()
+        self.queue_depth = queue_depth
+        self.model_path = model_path
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        return ProcessPoolExecutor(self.workers, mp_context=_WorkerContext(),
+                                   initializer=_warm, initargs=(self.model_path,))
+
+    def submit(self, model_path, rows, contributions=False):
+        """Queue ``rows`` (raw input tuples) for scoring; returns a Future of (labels, probas).
+
+        With ``contributions`` the Future holds (labels, probas, bias,
+        contributions) instead (see ``predict_with_contributions``). Raises
+        ``PoolBusy`` when ``queue_depth`` requests are already pending.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolBusy(f"All {self.queue_depth} prediction slots are busy")
+        try:
+            try:
+                future = self._executor.submit(_score, model_path, rows, contributions)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); replace the pool once
+                with self._lock:
+                    self._executor = self._start()
+                future = self._executor.submit(_score, model_path, rows, contributions)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.submitted += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self._slots.release()
+        with self._lock:
+            self.completed += 1
+
+    def predict(self, model_path, rows, timeout=None, contributions=False):
+        return self.submit(model_path, rows, contributions).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'queue_depth': self.queue_depth,
+                    'in_flight': self.submitted - self.completed, 'submitted': self.submitted,
+                    'completed': self.completed, 'rejected': self.rejected}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)